@@ -0,0 +1,283 @@
+"""
+HTTP/JSON calculation service for the Mortgage Comparison Tool.
+
+Serves the Mortgage calculations to other programs without the terminal.
+Every endpoint takes a POST request with a JSON body describing a loan
+with the same fields as the batch input: principal, apr,
+length_of_mortgage and optionally mortgage_name and
+extra_monthly_principal.
+
+    POST /payment      monthly payment and lifetime interest
+    POST /overpayment  early payoff with extra_monthly_principal and/or
+                       lump_payment
+    POST /compare      a list of loans ranked by lifetime interest
+    POST /schedule     the amortization schedule, streamed as one JSON
+                       row per line
+
+/payment and /overpayment also take a list of loans and answer with a
+list of results in the same order. A loan that is not valid gets an
+error result instead of failing the whole list.
+
+Usage: python run.py api [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import json
+import math
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import calculations
+from batch import create_mortgage_from_record
+from portfolio import Portfolio
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 16 * 1024 * 1024
+# Schedule rows sent in each chunk of a streamed response
+SCHEDULE_CHUNK_ROWS = 120
+# Errors raised by create_mortgage_from_record for loans that are not valid
+LOAN_ERRORS = (KeyError, TypeError, ValueError)
+
+
+class RequestError(Exception):
+    """A request that cannot be answered, with the HTTP status to send"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def error_result(error):
+    """Describes a loan that is not valid, as in the batch results"""
+    return {"error": f"{type(error).__name__}: {error}"}
+
+
+def payment_result(record):
+    """Calculates the monthly payment and lifetime interest of a loan"""
+    mortgage = create_mortgage_from_record(record)
+    return {
+        "mortgage_name": mortgage.mortgage_name,
+        "monthly_payment": mortgage.calculate_monthly_payment(),
+        "lifetime_interest": mortgage.calculate_lifetime_interest(),
+    }
+
+
+def overpayment_result(record):
+    """
+    Calculates when a loan is paid off and the interest saved with its
+    extra monthly principal and a lump payment
+    """
+    mortgage = create_mortgage_from_record(record)
+    lump_payment = float(record.get("lump_payment") or 0)
+    if not math.isfinite(lump_payment):
+        raise ValueError("lump_payment must be a finite number")
+    if lump_payment < 0:
+        raise ValueError("lump_payment cannot be negative")
+    payoff = mortgage.calculate_early_payoff(lump_payment=lump_payment)
+    result = {
+        "mortgage_name": mortgage.mortgage_name,
+        "monthly_payment": mortgage.calculate_monthly_payment(),
+    }
+    result.update(payoff._asdict())
+    return result
+
+
+def compare_result(records):
+    """
+    Calculates the payment and interest of every loan in one vectorized
+    pass and ranks the loans from the least lifetime interest to the most
+    """
+    if not isinstance(records, list) or len(records) < 1:
+        raise RequestError(HTTPStatus.BAD_REQUEST,
+                           "/compare takes a list of loans")
+    try:
+        mortgages = [create_mortgage_from_record(record)
+                     for record in records]
+    except LOAN_ERRORS as error:
+        raise RequestError(HTTPStatus.BAD_REQUEST,
+                           error_result(error)["error"])
+    portfolio = Portfolio.from_mortgages(mortgages)
+    monthly_payments = portfolio.calculate_monthly_payments()
+    lifetime_interest = portfolio.calculate_lifetime_interest(
+        monthly_payments
+    )
+    order = lifetime_interest.argsort(kind="stable")
+    return [
+        {
+            "rank": rank,
+            "index": int(index),
+            "mortgage_name": portfolio.mortgage_name[index],
+            "monthly_payment": float(monthly_payments[index]),
+            "lifetime_interest": float(lifetime_interest[index]),
+        }
+        for rank, index in enumerate(order.tolist(), start=1)
+    ]
+
+
+def iter_schedule_chunks(record, chunk_rows=SCHEDULE_CHUNK_ROWS):
+    """
+    Yields the amortization schedule of a loan in cents, including any
+    extra monthly principal, as blocks of JSON lines. The schedule ends
+    with the payment that clears the balance.
+    """
+    schedule = create_mortgage_from_record(record).cents_schedule()
+    fields = calculations.Schedule._fields
+    for start in range(0, len(schedule.month), chunk_rows):
+        end = start + chunk_rows
+        columns = [schedule.month[start:end].tolist()] + [
+            (column[start:end] / 100).tolist() for column in schedule[1:]
+        ]
+        yield "".join(json.dumps(dict(zip(fields, row)), allow_nan=False)
+                      + "\n"
+                      for row in zip(*columns)).encode()
+
+
+# Endpoints that answer one loan, or a list of loans one by one
+LOAN_ENDPOINTS = {
+    "/payment": payment_result,
+    "/overpayment": overpayment_result,
+}
+
+
+class CalculationHandler(BaseHTTPRequestHandler):
+    """Answers the calculation requests of one connection"""
+
+    # Keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    server_version = "MortgageAPI/1.0"
+    # Each response is buffered and sent in one write, with Nagle's
+    # algorithm off so small responses are not held back
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        try:
+            body = self.read_body()
+            if self.path in LOAN_ENDPOINTS:
+                self.send_json(HTTPStatus.OK,
+                               self.answer(LOAN_ENDPOINTS[self.path], body))
+            elif self.path == "/compare":
+                self.send_json(HTTPStatus.OK, compare_result(body))
+            elif self.path == "/schedule":
+                self.stream_schedule(body)
+            else:
+                raise RequestError(HTTPStatus.NOT_FOUND,
+                                   f"No endpoint at {self.path}")
+        except RequestError as error:
+            self.send_json(error.status, {"error": str(error)})
+
+    def read_body(self):
+        """Reads and decodes the JSON body of the request"""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 < length <= MAX_BODY_SIZE:
+            # The body cannot be read, so the connection cannot be reused
+            self.close_connection = True
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               "A JSON body with a Content-Length of at "
+                               f"most {MAX_BODY_SIZE} bytes is required")
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError as error:
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               f"The body is not valid JSON: {error}")
+
+    def answer(self, calculate, body):
+        """Answers one loan, or every loan of a list in order"""
+        if isinstance(body, list):
+            results = []
+            for record in body:
+                try:
+                    results.append(calculate(record))
+                except LOAN_ERRORS as error:
+                    results.append(error_result(error))
+            return results
+        try:
+            return calculate(body)
+        except LOAN_ERRORS as error:
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               error_result(error)["error"])
+
+    def send_json(self, status, value):
+        try:
+            # NaN and infinity are not valid JSON
+            data = json.dumps(value, allow_nan=False).encode()
+        except ValueError:
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            data = json.dumps(
+                {"error": "The result is not a finite number"}
+            ).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream_schedule(self, body):
+        """
+        Sends the schedule with chunked transfer encoding, so that rows
+        are sent as they are formatted rather than all at once
+        """
+        try:
+            chunks = iter_schedule_chunks(body)
+            first_chunk = next(chunks, b"")
+        except LOAN_ERRORS as error:
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               error_result(error)["error"])
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in (first_chunk, *chunks):
+            if chunk:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        # Logging every request to stderr would limit the throughput
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class CalculationServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Allows a large number of connections to queue while others are served
+    request_queue_size = 128
+
+    def __init__(self, address, verbose=False):
+        super().__init__(address, CalculationHandler)
+        self.verbose = verbose
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="run.py api",
+        description="Serve the Mortgage calculations over HTTP/JSON.",
+    )
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="port to listen on (default: 8080)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log every request")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs the calculation service until it is interrupted"""
+    args = parse_args(argv)
+    with CalculationServer((args.host, args.port), args.verbose) as server:
+        print(f"Serving the Mortgage calculations on "
+              f"http://{args.host}:{server.server_address[1]}",
+              file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Non-interactive batch scoring of mortgages.
+
+Reads mortgages from a CSV or JSONL file one row at a time, runs them
+through the Mortgage calculations and writes one JSON result per line, so
+memory use stays constant however large the input file is.
+
+Usage: python run.py batch in.csv --out out.jsonl [--workers 4]
+"""
+import argparse
+import collections
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from mortgage import Mortgage
+
+INPUT_FORMATS = ("csv", "jsonl")
+# Largest loan and longest term accepted, which keeps every schedule
+# within the cent engine's int64 range and a schedule store slot
+MAX_PRINCIPAL = 1_000_000_000
+MAX_LENGTH_OF_MORTGAGE = 40
+
+
+def read_records(input_file, input_format):
+    """
+    Yields each input row, as a dictionary for CSV and as the line of
+    JSON for JSONL, which parse_record decodes
+    """
+    if input_format == "csv":
+        yield from csv.DictReader(input_file)
+    else:
+        for line in input_file:
+            if line.strip():
+                yield line
+
+
+def parse_record(record):
+    """
+    Decodes a JSONL input row, so that a line that is not valid JSON is
+    reported like any other row that is not valid
+    """
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise TypeError("a mortgage must be a JSON object")
+    return record
+
+
+def create_mortgage_from_record(record):
+    """
+    Creates a Mortgage from an input row, applying the same validation as
+    the interactive prompts
+    """
+    try:
+        principal = int(record["principal"])
+        length_of_mortgage = int(record["length_of_mortgage"])
+    except OverflowError:
+        raise ValueError("principal and length_of_mortgage must be finite "
+                         "numbers") from None
+    apr = float(record["apr"])
+    extra_principal = float(record.get("extra_monthly_principal") or 0)
+    if principal <= 0 or length_of_mortgage <= 0:
+        raise ValueError("principal and length_of_mortgage must be whole "
+                         "numbers greater than 0")
+    if principal > MAX_PRINCIPAL:
+        raise ValueError(f"principal cannot be more than {MAX_PRINCIPAL:,}")
+    if length_of_mortgage > MAX_LENGTH_OF_MORTGAGE:
+        raise ValueError("length_of_mortgage cannot be more than "
+                         f"{MAX_LENGTH_OF_MORTGAGE} years")
+    if not 0 < apr < 100:
+        raise ValueError("apr must be greater than 0 but less than 100")
+    if not math.isfinite(extra_principal):
+        raise ValueError("extra_monthly_principal must be a finite number")
+    if extra_principal < 0:
+        raise ValueError("extra_monthly_principal cannot be negative")
+    return Mortgage(principal, apr, length_of_mortgage,
+                    str(record.get("mortgage_name", "")), extra_principal)
+
+
+def score_mortgage(mortgage):
+    """Calculates the payment, interest and schedule summary of a loan"""
+    schedule = mortgage.cents_schedule()
+    first_year = slice(0, 12)
+    return {
+        "mortgage_name": mortgage.mortgage_name,
+        "principal": mortgage.principal,
+        "apr": mortgage.apr,
+        "length_of_mortgage": mortgage.length_of_mortgage,
+        "extra_monthly_principal": mortgage.extra_monthly_principal,
+        "monthly_payment": mortgage.calculate_monthly_payment(),
+        "lifetime_interest": mortgage.calculate_lifetime_interest(),
+        "total_payments": mortgage.length_of_mortgage * 12,
+        "payoff_month": len(schedule.month),
+        "first_year_interest": int(schedule.interest[first_year].sum()) / 100,
+        "first_year_principal": int(
+            schedule.principal[first_year].sum()
+            + schedule.extra[first_year].sum()
+        ) / 100,
+        "balance_after_first_year": int(schedule.balance[first_year][-1])
+        / 100,
+        "interest_paid": int(schedule.interest.sum()) / 100,
+    }
+
+
+def score_record(line_number, record):
+    """
+    Scores one input row, returning an error result instead of stopping
+    the batch when the row is not valid
+    """
+    try:
+        result = score_mortgage(
+            create_mortgage_from_record(parse_record(record))
+        )
+    except (KeyError, TypeError, ValueError) as error:
+        result = {"error": f"{type(error).__name__}: {error}"}
+    result["line"] = line_number
+    return result
+
+
+def score_records(records):
+    """Yields a result for every input row, in input order"""
+    for line_number, record in enumerate(records, start=1):
+        yield score_record(line_number, record)
+
+
+def score_chunk(chunk):
+    """
+    Scores a chunk of numbered input rows in a worker process. Returns the
+    worker's process ID and time taken along with the results.
+    """
+    start = time.perf_counter()
+    results = [score_record(line_number, record)
+               for line_number, record in chunk]
+    return os.getpid(), time.perf_counter() - start, results
+
+
+def chunk_records(records, chunk_size):
+    """Groups numbered input rows into lists of chunk_size rows"""
+    numbered = enumerate(records, start=1)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_records_parallel(records, workers, chunk_size, worker_stats):
+    """
+    Scores input rows in chunks across a pool of worker processes and
+    yields the results in input order. Only a few chunks per worker are
+    in flight at once so memory stays bounded. Rows scored and time spent
+    are added to worker_stats for every worker process.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        chunks = chunk_records(records, chunk_size)
+        for chunk in itertools.islice(chunks, workers * 2):
+            pending.append(executor.submit(score_chunk, chunk))
+        while pending:
+            pid, seconds, results = pending.popleft().result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(score_chunk, chunk))
+            worker_stats[pid][0] += len(results)
+            worker_stats[pid][1] += seconds
+            yield from results
+
+
+def print_worker_stats(worker_stats):
+    """Prints the throughput of every worker process"""
+    for pid, (rows, seconds) in sorted(worker_stats.items()):
+        rate = rows / seconds if seconds else 0.0
+        print(f"Worker {pid}: {rows} mortgage(s) in {seconds:.2f}s "
+              f"({rate:,.0f} per second)", file=sys.stderr)
+
+
+def write_results(results, output_file):
+    """Writes one JSON result per line and returns the number written"""
+    count = 0
+    for result in results:
+        output_file.write(json.dumps(result) + "\n")
+        count += 1
+    return count
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="run.py batch",
+        description="Score mortgages from a CSV or JSONL file.",
+    )
+    parser.add_argument("input", help="CSV or JSONL file of mortgages, "
+                        "or - to read from standard input")
+    parser.add_argument("--out", default="-",
+                        help="JSONL file for the results (default: stdout)")
+    parser.add_argument("--format", choices=INPUT_FORMATS,
+                        help="input format (default: from the file name)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes, 0 for one per "
+                        "CPU core (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="rows sent to a worker at a time "
+                        "(default: 1000)")
+    args = parser.parse_args(argv)
+    if args.workers < 0 or args.chunk_size < 1:
+        parser.error("--workers must be 0 or more and --chunk-size "
+                     "must be greater than 0")
+    if args.workers == 0:
+        args.workers = os.cpu_count() or 1
+    if args.format is None:
+        args.format = "jsonl" if args.input.endswith(
+            (".jsonl", ".json")) else "csv"
+    return args
+
+
+def open_file(path, mode):
+    """Opens a file, or standard input/output for -"""
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, newline="" if "r" in mode else None,
+                encoding="utf-8")
+
+
+def main(argv=None):
+    """Runs the batch scoring command line"""
+    args = parse_args(argv)
+    input_file = open_file(args.input, "r")
+    output_file = open_file(args.out, "w")
+    worker_stats = collections.defaultdict(lambda: [0, 0.0])
+    start = time.perf_counter()
+    try:
+        records = read_records(input_file, args.format)
+        if args.workers > 1:
+            results = score_records_parallel(records, args.workers,
+                                             args.chunk_size, worker_stats)
+        else:
+            results = score_records(records)
+        count = write_results(results, output_file)
+    finally:
+        for file in (input_file, output_file):
+            if file not in (sys.stdin, sys.stdout):
+                file.close()
+    seconds = time.perf_counter() - start
+    print_worker_stats(worker_stats)
+    print(f"Scored {count} mortgage(s) in {seconds:.2f}s.", file=sys.stderr)
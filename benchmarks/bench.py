@@ -0,0 +1,269 @@
+"""
+Benchmark suite for the Mortgage calculation and rendering hot paths.
+
+Runs every benchmark against synthetic loan portfolios and reports
+operations per second, latency percentiles and peak memory. Results can
+be saved as JSON and compared against an earlier run to spot
+regressions. Google Sheets is replaced by an in-process fake, so no
+network access or credentials are needed.
+
+Usage:
+    python benchmarks/bench.py --sizes 1,1000,100000 --out results.json
+    python benchmarks/bench.py --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import calculations  # noqa: E402
+import money  # noqa: E402
+import sheets  # noqa: E402
+from mortgage import Mortgage  # noqa: E402
+from portfolio import Portfolio  # noqa: E402
+from storage import SheetsStore  # noqa: E402
+
+DEFAULT_SIZES = (1, 1000, 100000)
+MIN_YEARS = 5
+MAX_YEARS = 40
+
+
+class FakeWorksheet:
+    """In-process stand-in for a gspread worksheet"""
+
+    def __init__(self):
+        self.rows = [["principal", "apr", "length_of_mortgage",
+                      "monthly_payment", "lifetime_interest"]]
+
+    def append_rows(self, rows):
+        self.rows.extend([str(value) for value in row] for row in rows)
+
+    def get_all_values(self):
+        return [list(row) for row in self.rows]
+
+    def get_values(self, range_name):
+        first_row = int(range_name[1:range_name.index(":")])
+        return [list(row) for row in self.rows[first_row - 1:]] or [[]]
+
+
+def install_fake_sheets():
+    """Replaces the Google Sheets connection with fake worksheets"""
+    sheets._sheet = object()
+    sheets._worksheets["mortgage_data"] = FakeWorksheet()
+
+
+def synthetic_portfolio(size, seed=0):
+    """Creates a reproducible Portfolio of random loans"""
+    generator = np.random.default_rng(seed)
+    return Portfolio(
+        generator.integers(50, 1000, size) * 1000,
+        np.round(generator.uniform(0.5, 9.0, size), 2),
+        generator.integers(MIN_YEARS, MAX_YEARS + 1, size),
+        [f"loan{index}" for index in range(size)],
+        generator.choice([0, 0, 100, 250, 500], size),
+    )
+
+
+def clear_caches():
+    """Clears the process-wide calculation caches between benchmarks"""
+    money.monthly_payment_cents.cache_clear()
+    money.schedule_interest_cents.cache_clear()
+    calculations.cached_amortization_arrays.cache_clear()
+
+
+def measure(function, calls, repeat=1, memory_calls=10):
+    """
+    Calls function(index) for every index in calls, recording the latency
+    of each call. Peak memory is measured in a separate run over the
+    first memory_calls calls, so tracing does not slow down the timings.
+    """
+    clear_caches()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for index in calls:
+            call_start = time.perf_counter_ns()
+            function(index)
+            latencies.append(time.perf_counter_ns() - call_start)
+    elapsed = time.perf_counter() - start
+
+    clear_caches()
+    tracemalloc.start()
+    for index in calls[:memory_calls]:
+        function(index)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) / 1000
+    return {
+        "calls": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p95_us": float(np.percentile(latencies, 95)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "peak_memory_kb": peak_memory / 1024,
+    }
+
+
+def benchmark_cases(portfolio, max_calls):
+    """
+    Returns the benchmarks for a portfolio as (name, function, calls,
+    repeat). Per-loan benchmarks use at most max_calls loans, the
+    vectorized benchmarks use the whole portfolio.
+    """
+    size = len(portfolio)
+    mortgages = [
+        Mortgage(view.principal, view.apr, view.length_of_mortgage,
+                 view.mortgage_name, view.extra_monthly_principal)
+        for view in (portfolio[index] for index in range(min(size,
+                                                             max_calls)))
+    ]
+    loans = range(len(mortgages))
+    store = SheetsStore()
+    store.cache.path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    store.cache.max_age = 0
+
+    def fresh(index):
+        mortgage = mortgages[index]
+        # Reassigning a loan term clears the mortgage's own cache
+        mortgage.principal = mortgage.principal
+        return mortgage
+
+    return [
+        ("calculate_monthly_payment",
+         lambda index: fresh(index).calculate_monthly_payment(), loans, 1),
+        ("calculate_amortization_schedule",
+         lambda index: fresh(index).calculate_amortization_schedule(),
+         loans, 1),
+        ("extra_principal_payments",
+         lambda index: fresh(index).extra_principal_payments(), loans, 1),
+        ("get_table_values",
+         lambda index: fresh(index).get_table_values(), loans, 1),
+        ("render_amortization",
+         lambda index: tabulate(
+             fresh(index).calculate_amortization_schedule(),
+             headers="firstrow", tablefmt="github"), loans, 1),
+        ("render_comparison",
+         lambda _: tabulate(Portfolio.from_mortgages(mortgages)
+                            .get_table_values(), tablefmt="simple"),
+         range(1), 3),
+        ("portfolio_monthly_payments",
+         lambda _: portfolio.calculate_monthly_payments(), range(1), 3),
+        ("portfolio_cents_schedules",
+         lambda _: cents_schedules(portfolio, 1000), range(1), 3),
+        ("portfolio_table_values",
+         lambda _: portfolio.get_table_values(), range(1), 1),
+        ("store_append",
+         lambda index: store.append(fresh(index).create_mortgage_data()),
+         loans, 1),
+        ("store_metrics", lambda _: store.metrics(), range(1), 3),
+    ]
+
+
+def cents_schedules(portfolio, loans):
+    """Calculates the cent schedules of the first loans of a portfolio"""
+    return money.portfolio_cents_schedules(
+        *(term[:loans] for term in portfolio.cents_terms()),
+        portfolio.rounding,
+    )
+
+
+def run_benchmarks(sizes, max_calls, only=None):
+    """Runs every benchmark for every portfolio size"""
+    install_fake_sheets()
+    results = []
+    for size in sizes:
+        portfolio = synthetic_portfolio(size)
+        for name, function, calls, repeat in benchmark_cases(portfolio,
+                                                             max_calls):
+            if only and name not in only:
+                continue
+            result = measure(function, calls, repeat)
+            result.update(name=name, loans=size)
+            results.append(result)
+            print(f"{name:32} {size:>9} loans "
+                  f"{result['ops_per_sec']:>14,.1f} ops/s", file=sys.stderr)
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Returns the benchmarks whose ops/sec dropped by more than threshold
+    compared with the baseline run
+    """
+    previous = {(result["name"], result["loans"]): result
+                for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["loans"]))
+        if before and before["ops_per_sec"]:
+            change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+            if change < -threshold:
+                regressions.append((result["name"], result["loans"], change))
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Mortgage calculations and rendering."
+    )
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated portfolio sizes "
+                        "(up to 1000000)")
+    parser.add_argument("--max-calls", type=int, default=2000,
+                        help="most loans timed one by one in the per-loan "
+                        "benchmarks (default: 2000)")
+    parser.add_argument("--only", help="comma separated benchmark names")
+    parser.add_argument("--out", help="JSON file to save the results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown counted as a regression "
+                        "(default: 0.10)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+    results = run_benchmarks(sizes, args.max_calls, only)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    print(tabulate(
+        [[result["name"], result["loans"], result["ops_per_sec"],
+          result["p50_us"], result["p95_us"], result["p99_us"],
+          result["peak_memory_kb"]] for result in results],
+        headers=["Benchmark", "Loans", "ops/s", "p50 µs", "p95 µs",
+                 "p99 µs", "Peak KiB"],
+        floatfmt=",.1f",
+    ))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline, args.threshold)
+        for name, loans, change in regressions:
+            print(f"REGRESSION {name} ({loans} loans): {change:.1%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
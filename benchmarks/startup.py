@@ -0,0 +1,108 @@
+"""
+Start up benchmark for the Mortgage Comparison Tool.
+
+Imports run.py in fresh interpreters with python -X importtime and
+reports the median import time of run.py, the modules that take the
+longest to import and any deferred modules that were imported anyway.
+Exits with 1 when the import time is over the budget or a deferred
+module is imported at start up, so it can be used as a check.
+
+Usage:
+    python benchmarks/startup.py --repeat 10 --budget-ms 250
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from tabulate import tabulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules that are only imported once the feature that needs them is used
+DEFERRED_MODULES = ("gspread", "google.oauth2", "pyfiglet", "tabulate",
+                    "asyncio")
+
+
+def import_times(module="run"):
+    """
+    Imports a module in a fresh interpreter and returns the self and
+    cumulative import time in microseconds of every module it imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def run_startup_benchmark(repeat, module="run"):
+    """
+    Returns the median cumulative import time of module in milliseconds
+    and the import times of every module in the run closest to it
+    """
+    runs = [import_times(module) for _ in range(repeat)]
+    totals = [times[module][1] / 1000 for times in runs]
+    median = statistics.median(totals)
+    closest = min(range(repeat), key=lambda index: abs(totals[index]
+                                                       - median))
+    return median, runs[closest]
+
+
+def deferred_imports(times):
+    """Returns the deferred modules that were imported at start up"""
+    return sorted(
+        name for name in times
+        if any(name == module or name.startswith(module + ".")
+               for module in DEFERRED_MODULES)
+    )
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Measure the import time of the Mortgage Comparison "
+        "Tool."
+    )
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of fresh interpreters (default: 5)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="number of slowest modules to show "
+                        "(default: 15)")
+    parser.add_argument("--budget-ms", type=float,
+                        help="fail if the median import time is over this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    median, times = run_startup_benchmark(args.repeat)
+    slowest = sorted(times.items(), key=lambda item: -item[1][0])[:args.top]
+    print(tabulate(
+        [[name, self_us / 1000, cumulative_us / 1000]
+         for name, (self_us, cumulative_us) in slowest],
+        headers=["Module", "Self ms", "Cumulative ms"],
+        floatfmt=",.1f",
+    ))
+    print(f"\nimport run: {median:,.1f} ms (median of {args.repeat})")
+    failed = False
+    deferred = deferred_imports(times)
+    if deferred:
+        print("Imported at start up: " + ", ".join(deferred))
+        failed = True
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"OVER BUDGET: {median:,.1f} ms > {args.budget_ms:,.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
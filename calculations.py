@@ -0,0 +1,113 @@
+"""
+Numeric calculation engine for Mortgage schedules.
+
+All values are returned as NumPy arrays so that whole schedules are
+calculated in one step. Formatting into euro strings is left to the
+functions that render tables.
+"""
+import functools
+from collections import namedtuple
+
+import numpy as np
+
+
+Schedule = namedtuple(
+    "Schedule",
+    ["month", "payment", "principal", "extra", "interest", "balance"]
+)
+EarlyPayoff = namedtuple(
+    "EarlyPayoff",
+    ["payoff_month", "months_saved", "interest_paid", "interest_saved"]
+)
+
+
+def monthly_rate(apr):
+    """Converts an Annual Percentage Rate into a monthly rate"""
+    return apr / 100 / 12
+
+
+def balance_after(principal, rate, payment, months):
+    """
+    Calculates the balance left after a number of monthly payments using
+    the closed form of the annuity recurrence:
+    balance_k = principal * (1 + r)^k - payment * ((1 + r)^k - 1) / r
+    """
+    growth = np.power(1 + rate, months)
+    return principal * growth - payment * (growth - 1) / rate
+
+
+def amortization_arrays(principal, apr, length_of_mortgage, monthly_payment,
+                        extra_monthly_principal=0):
+    """
+    Calculates the balance, interest and principal for every month of a
+    loan, including any extra monthly principal payments, without
+    looping month by month.
+    """
+    rate = monthly_rate(apr)
+    month = np.arange(1, length_of_mortgage * 12 + 1)
+    balance = balance_after(
+        principal, rate, monthly_payment + extra_monthly_principal, month
+    )
+    opening_balance = np.empty_like(balance)
+    opening_balance[0] = principal
+    opening_balance[1:] = balance[:-1]
+    interest = opening_balance * rate
+    principal_paid = monthly_payment - interest
+    return Schedule(
+        month,
+        np.full(month.shape, float(monthly_payment)),
+        principal_paid,
+        np.full(month.shape, float(extra_monthly_principal)),
+        interest,
+        balance,
+    )
+
+
+def payoff_months(balance, apr, monthly_payment):
+    """
+    Solves the annuity formula for the (fractional) number of months it
+    takes to pay off a balance:
+    n = -log(1 - r * balance / payment) / log(1 + r)
+    Returns infinity when the payment does not cover the interest.
+    """
+    rate = monthly_rate(np.asarray(apr, dtype=np.float64))
+    ratio = rate * np.asarray(balance, dtype=np.float64) / monthly_payment
+    with np.errstate(divide="ignore", invalid="ignore"):
+        months = -np.log1p(-ratio) / np.log1p(rate)
+    return np.where(ratio < 1, months, np.inf)
+
+
+def interest_until_payoff(balance, apr, monthly_payment, payoff_month):
+    """
+    Calculates the interest paid on a balance when it is paid off in
+    payoff_month, with a smaller final payment that clears the balance
+    """
+    rate = monthly_rate(np.asarray(apr, dtype=np.float64))
+    full_payments = np.maximum(payoff_month - 1, 0)
+    final_payment = np.where(
+        payoff_month > 0,
+        balance_after(balance, rate, monthly_payment, full_payments)
+        * (1 + rate),
+        0.0,
+    )
+    total_paid = full_payments * monthly_payment + final_payment
+    return np.maximum(total_paid - balance, 0.0)
+
+
+@functools.lru_cache(maxsize=1024)
+def cached_amortization_arrays(principal, apr, length_of_mortgage,
+                               monthly_payment, extra_monthly_principal=0):
+    """
+    Returns amortization_arrays from a process-wide cache. The arrays are
+    shared between callers, so they are made read-only.
+    """
+    schedule = amortization_arrays(principal, apr, length_of_mortgage,
+                                   monthly_payment, extra_monthly_principal)
+    for column in schedule:
+        column.flags.writeable = False
+    return schedule
+
+
+def format_euro(value, prefix="€"):
+    """Formats a number as a euro amount for display in a table"""
+    return prefix + "{:,.2f}".format(value)
@@ -1,5 +1,10 @@
-const Pty = require('node-pty');
+const childProcess = require('child_process');
 const fs = require('fs');
+const net = require('net');
+
+const SESSION_SERVER_PORT = parseInt(process.env.SESSION_SERVER_PORT || '8765');
+const CONNECT_RETRIES = 50;
+const CONNECT_RETRY_DELAY = 200;
 
 exports.install = function () {
 
@@ -8,44 +13,72 @@ exports.install = function () {
 
 };
 
-function socket() {
+// One long-lived Python process runs the sessions of every visitor
+function startSessionServer() {
+    const server = childProcess.spawn('python3', ['server.py'], {
+        cwd: process.env.PWD,
+        env: process.env,
+        stdio: 'inherit'
+    });
 
-    this.encodedecode = false;
-    this.autodestroy();
+    server.on('exit', function (code, signal) {
+        console.log("Session server stopped, restarting");
+        setTimeout(startSessionServer, 1000);
+    });
+}
 
-    this.on('open', function (client) {
+// Connects to the session server, waiting for it to start if needed
+function connectSession(client, retries) {
+    const session = net.createConnection(SESSION_SERVER_PORT, '127.0.0.1');
+    // Decodes the terminal output as UTF-8 so a character split across
+    // two reads, like the 3-byte euro sign, is sent to the browser whole
+    session.setEncoding('utf8');
+
+    session.on('connect', function () {
+        client.session = session;
+    });
+
+    session.on('error', function (err) {
+        if (!client.session && retries > 0 && !client.closed) {
+            setTimeout(connectSession, CONNECT_RETRY_DELAY, client, retries - 1);
+        } else {
+            console.log('Session error: ', err);
+        }
+    });
+
+    session.on('data', function (data) {
+        client.send(data);
+    });
 
-        // Spawn terminal
-        client.tty = Pty.spawn('python3', ['run.py'], {
-            name: 'xterm-color',
-            cols: 80,
-            rows: 24,
-            cwd: process.env.PWD,
-            env: process.env
-        });
-
-        client.tty.on('exit', function (code, signal) {
-            client.tty = null;
+    session.on('close', function () {
+        if (client.session === session) {
+            client.session = null;
             client.close();
-            console.log("Process killed");
-        });
+            console.log("Session ended");
+        }
+    });
+}
 
-        client.tty.on('data', function (data) {
-            client.send(data);
-        });
+function socket() {
+
+    this.encodedecode = false;
+    this.autodestroy();
 
+    this.on('open', function (client) {
+        connectSession(client, CONNECT_RETRIES);
     });
 
     this.on('close', function (client) {
-        if (client.tty) {
-            client.tty.kill(9);
-            client.tty = null;
-            console.log("Process killed and terminal unloaded");
+        client.closed = true;
+        if (client.session) {
+            client.session.destroy();
+            client.session = null;
+            console.log("Session closed and terminal unloaded");
         }
     });
 
     this.on('message', function (client, msg) {
-        client.tty && client.tty.write(msg);
+        client.session && client.session.write(msg);
     });
 }
 
@@ -56,5 +89,10 @@ if (process.env.CREDS != null) {
             console.log('Error writing file: ', err);
             socket.emit("console_output", "Error saving credentials: " + err);
         }
+        // Started once the credentials are saved, so it can connect to
+        // Google Sheets straight away
+        startSessionServer();
     });
-}
\ No newline at end of file
+} else {
+    startSessionServer();
+}
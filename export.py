@@ -0,0 +1,266 @@
+"""
+Columnar export of amortization schedules.
+
+Writes the cent-exact schedules of every loan in a Portfolio as the
+columns loan_id, month, payment, principal, extra, interest and balance,
+with the amounts in euros. The schedules are calculated and written a
+chunk of loans at a time, so memory use stays bounded however large the
+portfolio is.
+
+Formats:
+    npy      a directory with one .npy file per column, which
+             np.load(path, mmap_mode="r") memory-maps
+    npz      the same columns in a single uncompressed .npz archive
+    arrow    an Arrow IPC file, which pyarrow.memory_map can open
+    parquet  a Parquet file
+
+Arrow and Parquet need the optional pyarrow package.
+
+Usage: python run.py export in.csv --out schedules.parquet
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+import money
+from batch import (create_mortgage_from_record, open_file, parse_record,
+                   read_records)
+from portfolio import Portfolio
+
+EXPORT_FORMATS = ("npy", "npz", "arrow", "parquet")
+COLUMN_TYPES = {
+    "loan_id": np.int64,
+    "month": np.int32,
+    "payment": np.float64,
+    "principal": np.float64,
+    "extra": np.float64,
+    "interest": np.float64,
+    "balance": np.float64,
+}
+SCHEDULE_COLUMNS = tuple(COLUMN_TYPES)
+# Loans calculated and written at a time
+CHUNK_LOANS = 1000
+
+
+def portfolio_schedule_lengths(portfolio, include_extra=True):
+    """Returns the number of schedule rows of every loan in a portfolio"""
+    months, _ = money.portfolio_cents_totals(
+        *portfolio.cents_terms(include_extra), portfolio.rounding
+    )
+    return months
+
+
+def iter_schedule_chunks(portfolio, include_extra=True,
+                         chunk_loans=CHUNK_LOANS):
+    """
+    Yields the schedules of a portfolio as dictionaries of column arrays,
+    chunk_loans loans at a time. The rows are those of the cent schedules
+    behind extra_principal_payments with include_extra, and behind
+    calculate_amortization_schedule without it, and end with the payment
+    that clears the balance.
+    """
+    terms = portfolio.cents_terms(include_extra)
+    for start in range(0, len(portfolio), chunk_loans):
+        loans = slice(start, start + chunk_loans)
+        loan, schedule = money.portfolio_cents_schedules(
+            *(term[loans] for term in terms), portfolio.rounding
+        )
+        values = (portfolio.mortgage_ID[loans][loan], schedule.month) + tuple(
+            column / 100 for column in schedule[1:]
+        )
+        yield {
+            column: np.asarray(value, dtype=COLUMN_TYPES[column])
+            for column, value in zip(SCHEDULE_COLUMNS, values)
+        }
+
+
+def export_npy(portfolio, path, include_extra=True,
+               chunk_loans=CHUNK_LOANS):
+    """
+    Writes one memory-mappable .npy file per column into the directory
+    path. The number of rows is known ahead, so every chunk is written
+    straight into its place in the files. Returns the number of rows.
+    """
+    rows = int(portfolio_schedule_lengths(portfolio, include_extra).sum())
+    os.makedirs(path, exist_ok=True)
+    files = {
+        column: np.lib.format.open_memmap(
+            os.path.join(path, f"{column}.npy"), mode="w+",
+            dtype=COLUMN_TYPES[column], shape=(rows,)
+        )
+        for column in SCHEDULE_COLUMNS
+    }
+    position = 0
+    for chunk in iter_schedule_chunks(portfolio, include_extra,
+                                      chunk_loans):
+        chunk_rows = len(chunk["month"])
+        for column, values in chunk.items():
+            files[column][position:position + chunk_rows] = values
+        position += chunk_rows
+    for column_file in files.values():
+        column_file.flush()
+    return rows
+
+
+def export_npz(portfolio, path, include_extra=True,
+               chunk_loans=CHUNK_LOANS):
+    """
+    Writes the columns into an uncompressed .npz archive by writing the
+    .npy files first and copying them into the archive one at a time
+    """
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        rows = export_npy(portfolio, directory, include_extra, chunk_loans)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED,
+                             allowZip64=True) as archive:
+            for column in SCHEDULE_COLUMNS:
+                archive.write(os.path.join(directory, f"{column}.npy"),
+                              f"{column}.npy")
+    finally:
+        shutil.rmtree(directory)
+    return rows
+
+
+def import_pyarrow():
+    """Imports pyarrow, which is only needed for Arrow and Parquet files"""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ImportError("Writing Arrow and Parquet files needs pyarrow: "
+                          "pip install pyarrow") from None
+    return pyarrow
+
+
+def export_arrow(portfolio, path, include_extra=True,
+                 chunk_loans=CHUNK_LOANS, export_format="arrow"):
+    """
+    Writes the columns as an Arrow IPC file or a Parquet file, with a
+    record batch or row group for every chunk of loans
+    """
+    pyarrow = import_pyarrow()
+    schema = pyarrow.schema([
+        (column, pyarrow.from_numpy_dtype(dtype))
+        for column, dtype in COLUMN_TYPES.items()
+    ])
+    if export_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(path, schema)
+    else:
+        writer = pyarrow.ipc.new_file(path, schema)
+    rows = 0
+    with writer:
+        for chunk in iter_schedule_chunks(portfolio, include_extra,
+                                          chunk_loans):
+            writer.write_table(pyarrow.table(chunk, schema=schema))
+            rows += len(chunk["month"])
+    return rows
+
+
+def export_schedules(portfolio, path, export_format=None,
+                     include_extra=True, chunk_loans=CHUNK_LOANS):
+    """
+    Writes the schedules of a Portfolio, or of a list of Mortgages, to
+    path in one of the EXPORT_FORMATS, by default the one matching the
+    file extension. Returns the number of rows written.
+    """
+    if not isinstance(portfolio, Portfolio):
+        portfolio = Portfolio.from_mortgages(portfolio)
+    if export_format is None:
+        export_format = format_from_path(path)
+    if export_format == "npy":
+        return export_npy(portfolio, path, include_extra, chunk_loans)
+    if export_format == "npz":
+        return export_npz(portfolio, path, include_extra, chunk_loans)
+    if export_format in ("arrow", "parquet"):
+        return export_arrow(portfolio, path, include_extra, chunk_loans,
+                            export_format)
+    raise ValueError(f"export format must be one of {EXPORT_FORMATS}")
+
+
+def format_from_path(path):
+    """Picks the export format from a file extension, npy for none"""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension in ("arrow", "feather", "ipc"):
+        return "arrow"
+    return extension if extension in EXPORT_FORMATS else "npy"
+
+
+def read_portfolio(input_file, input_format):
+    """
+    Reads the mortgages of a batch input file into a Portfolio. Rows that
+    are not valid are reported and left out.
+    """
+    mortgages = []
+    for line_number, record in enumerate(read_records(input_file,
+                                                      input_format),
+                                         start=1):
+        try:
+            record = parse_record(record)
+            mortgage = create_mortgage_from_record(record)
+            mortgage.mortgage_ID = int(record.get("loan_id") or line_number)
+        except (KeyError, TypeError, ValueError) as error:
+            print(f"Line {line_number}: {type(error).__name__}: {error}",
+                  file=sys.stderr)
+            continue
+        mortgages.append(mortgage)
+    return Portfolio.from_mortgages(mortgages)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="run.py export",
+        description="Export the amortization schedules of the mortgages "
+        "in a CSV or JSONL file to columnar files.",
+    )
+    parser.add_argument("input", help="CSV or JSONL file of mortgages, "
+                        "or - to read from standard input")
+    parser.add_argument("--out", required=True,
+                        help="file, or directory for npy, to write")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="export format (default: from --out)")
+    parser.add_argument("--input-format", choices=("csv", "jsonl"),
+                        help="input format (default: from the file name)")
+    parser.add_argument("--no-extra", action="store_true",
+                        help="export the schedules without the extra "
+                        "monthly principal")
+    parser.add_argument("--chunk-loans", type=int, default=CHUNK_LOANS,
+                        help="loans calculated at a time "
+                        f"(default: {CHUNK_LOANS})")
+    args = parser.parse_args(argv)
+    if args.chunk_loans < 1:
+        parser.error("--chunk-loans must be greater than 0")
+    if args.input_format is None:
+        args.input_format = "jsonl" if args.input.endswith(
+            (".jsonl", ".json")) else "csv"
+    return args
+
+
+def main(argv=None):
+    """Runs the schedule export command line"""
+    args = parse_args(argv)
+    start = time.perf_counter()
+    input_file = open_file(args.input, "r")
+    try:
+        portfolio = read_portfolio(input_file, args.input_format)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+    try:
+        rows = export_schedules(portfolio, args.out, args.format,
+                                not args.no_extra, args.chunk_loans)
+    except ImportError as error:
+        sys.exit(str(error))
+    print(f"Exported {rows} schedule row(s) of {len(portfolio)} "
+          f"mortgage(s) in {time.perf_counter() - start:.2f}s.",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Opt-in timing instrumentation for the Mortgage Comparison Tool.
+
+Set MORTGAGE_TRACE=1 to time menu actions, Google Sheets calls and
+Mortgage calculations. Spans are kept in an in-memory histogram whose
+summary is printed on exit, and are also written to a JSONL file when
+MORTGAGE_TRACE_FILE is set. More sinks can be added with add_sink.
+
+When tracing is disabled the timed decorator returns functions
+unchanged and span returns a shared no-op context manager, so the
+overhead is close to zero.
+"""
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ENABLED = os.environ.get("MORTGAGE_TRACE", "") not in ("", "0")
+TRACE_FILE = os.environ.get("MORTGAGE_TRACE_FILE")
+
+_NO_SPAN = contextlib.nullcontext()
+_sinks = []
+
+
+class HistogramSink:
+    """Collects span durations in memory, grouped by span name"""
+
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, start, duration):
+        with self._lock:
+            self.durations.setdefault(name, []).append(duration)
+
+    def summary(self):
+        """Returns a row of timing statistics in milliseconds per span"""
+        rows = []
+        with self._lock:
+            durations = {name: np.array(values) * 1000
+                         for name, values in self.durations.items()}
+        for name, values in sorted(durations.items(),
+                                   key=lambda item: -item[1].sum()):
+            rows.append([
+                name,
+                len(values),
+                values.sum(),
+                values.mean(),
+                np.percentile(values, 50),
+                np.percentile(values, 95),
+                values.max(),
+            ])
+        return rows
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """Writes every span as a line of JSON to a file"""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, name, start, duration):
+        line = json.dumps({"name": name, "start": start,
+                           "duration_ms": duration * 1000})
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def add_sink(sink):
+    """Sends spans to another sink with record(name, start, duration)"""
+    _sinks.append(sink)
+
+
+def record(name, start, duration):
+    """Sends a finished span to every sink"""
+    for sink in _sinks:
+        sink.record(name, start, duration)
+
+
+@contextlib.contextmanager
+def _span(name):
+    start = time.time()
+    counter = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter() - counter)
+
+
+def span(name):
+    """Times the block of a with statement as a span called name"""
+    return _span(name) if ENABLED else _NO_SPAN
+
+
+def timed(name=None):
+    """
+    Decorator that times every call of a function as a span. Functions
+    are returned unchanged when tracing is disabled.
+    """
+
+    def decorator(function):
+        if not ENABLED:
+            return function
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def print_summary(histogram, file=sys.stderr):
+    """Prints the timing summary of every span"""
+    rows = histogram.summary()
+    if not rows:
+        return
+    from tabulate import tabulate
+    print("\nTiming summary (ms):", file=file)
+    print(
+        tabulate(
+            rows,
+            headers=["Span", "Calls", "Total", "Mean", "p50", "p95", "Max"],
+            floatfmt=".2f",
+        ),
+        file=file,
+    )
+
+
+def _close():
+    """Closes every sink and prints the summary on exit"""
+    for sink in _sinks:
+        sink.close()
+    print_summary(_histogram)
+
+
+if ENABLED:
+    _histogram = HistogramSink()
+    add_sink(_histogram)
+    if TRACE_FILE:
+        add_sink(JsonlSink(TRACE_FILE))
+    atexit.register(_close)
@@ -0,0 +1,102 @@
+"""
+Background asyncio event loop for storage and Google Sheets I/O.
+
+gspread and sqlite3 only have blocking calls, so each call runs on a
+small thread pool owned by an event loop on its own thread. Callers get
+a concurrent.futures.Future back straight away, so several requests can
+be in flight at once, every request has a timeout, and a caller that no
+longer needs a result can cancel it. asyncio is only imported when the
+first request starts.
+"""
+import concurrent.futures
+import os
+import threading
+
+TIMEOUT = float(os.environ.get("MORTGAGE_IO_TIMEOUT", "30"))
+MAX_WORKERS = 4
+
+# Requests that time out raise concurrent.futures.TimeoutError, which is
+# the built in TimeoutError from Python 3.11
+TIMEOUT_ERRORS = (concurrent.futures.TimeoutError,)
+
+_loop = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_loop():
+    """Starts the event loop thread on first use and returns the loop"""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                import asyncio
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(
+                    concurrent.futures.ThreadPoolExecutor(
+                        MAX_WORKERS, thread_name_prefix="io-worker"
+                    )
+                )
+                threading.Thread(target=loop.run_forever, name="io-loop",
+                                 daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+async def call(function, *args, timeout=TIMEOUT):
+    """
+    Runs a blocking function on the worker threads, raising a timeout
+    error if it takes longer than timeout seconds
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(None, _in_worker, function, args), timeout
+        )
+    except asyncio.TimeoutError:
+        # asyncio has its own timeout error before Python 3.11
+        raise concurrent.futures.TimeoutError(
+            f"request took longer than {timeout} seconds"
+        ) from None
+
+
+def _in_worker(function, args):
+    """Runs a function on a worker thread, marking the thread as one"""
+    _local.worker = True
+    return function(*args)
+
+
+def submit(function, *args, timeout=TIMEOUT):
+    """
+    Starts a blocking function in the background and returns a Future of
+    its result. Cancelling the Future abandons the call.
+    """
+    loop = get_loop()
+    import asyncio
+    return asyncio.run_coroutine_threadsafe(
+        call(function, *args, timeout=timeout), loop
+    )
+
+
+def wait(future):
+    """
+    Waits for the result of a Future, cancelling it if the user
+    interrupts the wait
+    """
+    try:
+        return future.result()
+    except KeyboardInterrupt:
+        future.cancel()
+        raise
+
+
+def run(function, *args, timeout=TIMEOUT):
+    """
+    Runs a blocking function in the background and waits for it. Calls
+    made from a worker thread run straight away, so that nested calls
+    cannot use up every worker.
+    """
+    if getattr(_local, "worker", False):
+        return function(*args)
+    return wait(submit(function, *args, timeout=timeout))
@@ -0,0 +1,108 @@
+"""
+Streaming aggregate metrics for the mortgage data stored in Google Sheets.
+
+Rows are read once, left unchanged, and can be added incrementally as
+new mortgages arrive without rescanning the rows already counted.
+"""
+import math
+
+MORTGAGE_DATA_COLUMNS = (
+    "principal",
+    "apr",
+    "length_of_mortgage",
+    "monthly_payment",
+    "lifetime_interest",
+)
+
+
+class ColumnStats:
+    """
+    Running count, mean, minimum, maximum and variance of one column,
+    updated one value at a time with Welford's algorithm
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self._sum_of_squares = 0.0
+
+    @classmethod
+    def from_aggregates(cls, count, total, total_of_squares, minimum,
+                        maximum):
+        """
+        Creates column statistics from aggregates calculated elsewhere,
+        e.g. by a database query
+        """
+        stats = cls()
+        if count:
+            stats.count = count
+            stats.mean = total / count
+            stats._sum_of_squares = max(
+                total_of_squares - total * stats.mean, 0.0
+            )
+            stats.minimum = minimum
+            stats.maximum = maximum
+        return stats
+
+    def update(self, value):
+        """Adds a value to the running statistics"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._sum_of_squares += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def variance(self):
+        """Sample variance of the values seen so far"""
+        if self.count < 2:
+            return 0.0
+        return self._sum_of_squares / (self.count - 1)
+
+
+class MortgageMetrics:
+    """
+    Aggregates every column of the mortgage_data worksheet in a single
+    pass over the rows
+    """
+
+    def __init__(self, columns=MORTGAGE_DATA_COLUMNS):
+        self.columns = {name: ColumnStats() for name in columns}
+        # Rows passed to update, including the rows that were skipped
+        self.rows_read = 0
+
+    @property
+    def count(self):
+        """Number of rows aggregated so far"""
+        return next(iter(self.columns.values())).count
+
+    def update(self, rows):
+        """
+        Adds data rows (without the header) to the aggregates. The rows
+        are only read, never modified. A row that is short or has a value
+        that is not a finite number is skipped as a whole, so every
+        column counts the same rows.
+        """
+        stats = list(self.columns.values())
+        for row in rows:
+            self.rows_read += 1
+            try:
+                values = [float(value) for value in row[:len(stats)]]
+            except (TypeError, ValueError):
+                continue
+            if len(values) < len(stats) or not all(
+                math.isfinite(value) for value in values
+            ):
+                continue
+            for column, value in zip(stats, values):
+                column.update(value)
+
+    def means(self):
+        """Returns the mean of every column in column order"""
+        return [column.mean for column in self.columns.values()]
+
+    def __getitem__(self, name):
+        return self.columns[name]
@@ -0,0 +1,427 @@
+"""
+Cent-exact money engine for Mortgage schedules.
+
+Amounts are whole numbers of cents and APRs are whole numbers of
+APR_SCALE-ths of a percent, so every schedule is calculated with integer
+arithmetic and gives the same result on every machine. Interest is
+rounded to the cent each month with an explicit rounding mode, the
+balance is carried in cents, and the final payment of the term is
+adjusted so that the balance ends at exactly zero, as on a bank
+statement.
+
+Single loans are calculated with Python integers and portfolios with
+int64 NumPy arrays, one month at a time across every loan at once. The
+arrays hold balances of up to about €90 billion at an APR of 100%.
+"""
+import decimal
+import functools
+import math
+
+import numpy as np
+
+from calculations import Schedule
+
+# An APR of 3.5% is held as 35000
+APR_SCALE = 10000
+# Interest for a month is balance * apr / MONTHLY_DIVISOR, in cents
+MONTHLY_DIVISOR = 12 * 100 * APR_SCALE
+
+# Rounding modes, named as in the decimal module. Amounts being rounded
+# are never negative, so DOWN and UP are also floor and ceiling.
+ROUND_HALF_UP = "ROUND_HALF_UP"
+ROUND_HALF_EVEN = "ROUND_HALF_EVEN"
+ROUND_DOWN = "ROUND_DOWN"
+ROUND_UP = "ROUND_UP"
+ROUNDING_MODES = (ROUND_HALF_UP, ROUND_HALF_EVEN, ROUND_DOWN, ROUND_UP)
+DEFAULT_ROUNDING = ROUND_HALF_UP
+# Payments calculated with floating point are closer than this to the
+# exact payment, in cents, for every loan term the tool accepts
+PAYMENT_TOLERANCE = 1e-6
+PAYMENT_RELATIVE_TOLERANCE = 1e-12
+# The digits of the cents and of each group of three euro digits of an
+# amount as shown, looked up rather than formatted
+CENT_DIGITS = tuple(f"{cents:02d}" for cents in range(100))
+THOUSAND_DIGITS = tuple(f"{euros:03d}" for euros in range(1000))
+
+
+def rounding_offset(denominator, rounding=DEFAULT_ROUNDING):
+    """
+    Returns the amount added to a numerator so that floor division by
+    denominator rounds the quotient with the given rounding mode
+    """
+    if rounding in (ROUND_HALF_UP, ROUND_HALF_EVEN):
+        return denominator // 2
+    if rounding == ROUND_DOWN:
+        return 0
+    if rounding == ROUND_UP:
+        return denominator - 1
+    raise ValueError(f"rounding must be one of {ROUNDING_MODES}")
+
+
+def divide(numerator, denominator, rounding=DEFAULT_ROUNDING):
+    """
+    Divides non-negative integers, or int64 arrays, rounding the quotient
+    to a whole number with the given rounding mode
+    """
+    numerator = numerator + rounding_offset(denominator, rounding)
+    if rounding != ROUND_HALF_EVEN:
+        return numerator // denominator
+    quotient, remainder = divmod(numerator, denominator)
+    if denominator % 2 == 0:
+        # No remainder after adding half means an exact tie, which was
+        # rounded up and goes back down if that made the quotient odd
+        return quotient - ((remainder == 0) & (quotient % 2 == 1))
+    return quotient
+
+
+def to_cents(amount, rounding=DEFAULT_ROUNDING):
+    """Converts a euro amount into a whole number of cents"""
+    return int(decimal.Decimal(str(amount)).scaleb(2).quantize(
+        1, rounding=rounding))
+
+
+def to_scaled_apr(apr):
+    """Converts an APR in percent into APR_SCALE-ths of a percent"""
+    return int(decimal.Decimal(str(apr)).scaleb(4).quantize(
+        1, rounding=decimal.ROUND_HALF_EVEN))
+
+
+def decimal_payment_cents(principal, apr, payments,
+                          rounding=DEFAULT_ROUNDING):
+    """
+    Calculates the payment in cents that pays off principal cents at a
+    scaled APR in a number of monthly payments, using decimal arithmetic
+    so the rounding is exact
+    """
+    with decimal.localcontext() as context:
+        context.prec = 34
+        rate = decimal.Decimal(apr) / MONTHLY_DIVISOR
+        growth = (1 + rate) ** payments
+        payment = decimal.Decimal(principal) * rate * growth / (growth - 1)
+        return int(payment.quantize(1, rounding=rounding))
+
+
+def near_rounding_boundary(payment, rounding=DEFAULT_ROUNDING):
+    """
+    Returns whether a non-negative payment in cents calculated with
+    floating point, or an array of them, is too close to a rounding
+    boundary for floating point to decide which way it rounds
+    """
+    fraction = payment % 1.0
+    tolerance = PAYMENT_TOLERANCE + payment * PAYMENT_RELATIVE_TOLERANCE
+    if rounding in (ROUND_HALF_UP, ROUND_HALF_EVEN):
+        return abs(fraction - 0.5) < tolerance
+    return (fraction < tolerance) | (1.0 - fraction < tolerance)
+
+
+def payment_cents(principal, apr, payments, rounding=DEFAULT_ROUNDING):
+    """
+    Calculates the payment in cents that pays off principal cents at a
+    scaled APR in a number of monthly payments. Floating point is used
+    unless the payment is too close to a rounding boundary for it to
+    decide, when decimal_payment_cents gives the exact rounding.
+    """
+    rate = apr / MONTHLY_DIVISOR
+    payment = principal * rate / -math.expm1(-payments * math.log1p(rate))
+    if near_rounding_boundary(payment, rounding):
+        return decimal_payment_cents(principal, apr, payments, rounding)
+    if rounding == ROUND_DOWN:
+        return math.floor(payment)
+    if rounding == ROUND_UP:
+        return math.ceil(payment)
+    return math.floor(payment + 0.5)
+
+
+@functools.lru_cache(maxsize=65536)
+def monthly_payment_cents(principal, apr, length_of_mortgage,
+                          rounding=DEFAULT_ROUNDING):
+    """
+    Calculates the monthly payment in cents of a loan. Results are kept
+    in a process-wide cache so identical loans are only calculated once.
+    """
+    return payment_cents(principal, apr, length_of_mortgage * 12, rounding)
+
+
+def cents_schedule(principal, apr, length_of_mortgage, monthly_payment,
+                   extra_monthly_principal=0, rounding=DEFAULT_ROUNDING,
+                   first_month=1, last_month=None):
+    """
+    Calculates the schedule of one loan in cents until it is paid off.
+    The final payment of the term clears whatever balance is left, and a
+    loan paid off early by extra principal ends with a smaller payment.
+
+    With first_month and last_month only those months are calculated,
+    and principal is the balance left before first_month.
+    """
+    total_payments = length_of_mortgage * 12
+    if last_month is None:
+        last_month = total_payments
+    last_month = min(last_month, total_payments)
+    offset = rounding_offset(MONTHLY_DIVISOR, rounding)
+    half_even = rounding == ROUND_HALF_EVEN
+    paid = monthly_payment + extra_monthly_principal
+    balance = principal
+    interests = []
+    balances = []
+    add_interest = interests.append
+    add_balance = balances.append
+    final = None
+    # Every month but the last pays the monthly payment and the extra
+    # principal in full, so only the interest and the balance are kept
+    # in the loop, which runs for every month of every schedule shown
+    for month in range(first_month, last_month + 1 if principal > 0 else 0):
+        interest, remainder = divmod(balance * apr + offset, MONTHLY_DIVISOR)
+        if half_even and not remainder and interest % 2:
+            interest -= 1
+        due = balance + interest
+        add_interest(interest)
+        if due <= paid or month == total_payments:
+            # The final payment clears the balance
+            payment = (due if month == total_payments or due < monthly_payment
+                       else monthly_payment)
+            final = payment, due - payment
+            add_balance(0)
+            break
+        balance = due - paid
+        add_balance(balance)
+    interest = np.array(interests, dtype=np.int64)
+    months = len(interest)
+    payment = np.full(months, monthly_payment, dtype=np.int64)
+    extra = np.full(months, extra_monthly_principal, dtype=np.int64)
+    if final is not None:
+        payment[-1], extra[-1] = final
+    return Schedule(np.arange(first_month, first_month + months),
+                    payment, payment - interest, extra, interest,
+                    np.array(balances, dtype=np.int64))
+
+
+@functools.lru_cache(maxsize=65536)
+def schedule_interest_cents(principal, apr, length_of_mortgage,
+                            rounding=DEFAULT_ROUNDING):
+    """
+    Calculates the interest paid in cents over the schedule of a loan
+    without extra principal, the same total as the interest column of
+    cents_schedule, without keeping the rows. The final payment of the
+    term only changes the payment, not the interest, so it is not needed.
+    Results are kept in a process-wide cache like monthly_payment_cents.
+    """
+    payment = monthly_payment_cents(principal, apr, length_of_mortgage,
+                                    rounding)
+    offset = rounding_offset(MONTHLY_DIVISOR, rounding)
+    half_even = rounding == ROUND_HALF_EVEN
+    balance = principal
+    total = 0
+    for _ in range(length_of_mortgage * 12):
+        interest, remainder = divmod(balance * apr + offset, MONTHLY_DIVISOR)
+        if half_even and not remainder and interest % 2:
+            interest -= 1
+        total += interest
+        balance += interest - payment
+        if balance <= 0:
+            break
+    return total
+
+
+def portfolio_payment_cents(principal, apr, payments,
+                            rounding=DEFAULT_ROUNDING):
+    """
+    Calculates the payments in cents that pay off many loans in a number
+    of monthly payments each, with floating point, falling back to
+    decimal_payment_cents for the rare payments too close to a rounding
+    boundary for floating point to decide
+    """
+    principal = np.asarray(principal, dtype=np.int64)
+    apr = np.asarray(apr, dtype=np.int64)
+    payments = np.asarray(payments, dtype=np.int64)
+    rate = apr / MONTHLY_DIVISOR
+    payment = principal * rate / -np.expm1(-payments * np.log1p(rate))
+    if rounding == ROUND_DOWN:
+        cents = np.floor(payment)
+    elif rounding == ROUND_UP:
+        cents = np.ceil(payment)
+    else:
+        cents = np.floor(payment + 0.5)
+    cents = cents.astype(np.int64)
+    close = near_rounding_boundary(payment, rounding)
+    principal, apr, payments = np.broadcast_arrays(principal, apr, payments)
+    for index in np.flatnonzero(close).tolist():
+        cents.flat[index] = decimal_payment_cents(
+            int(principal.flat[index]), int(apr.flat[index]),
+            int(payments.flat[index]), rounding
+        )
+    return cents
+
+
+def portfolio_monthly_payment_cents(principal, apr, length_of_mortgage,
+                                    rounding=DEFAULT_ROUNDING):
+    """Calculates the monthly payments in cents of many loans"""
+    return portfolio_payment_cents(
+        principal, apr, np.asarray(length_of_mortgage, dtype=np.int64) * 12,
+        rounding
+    )
+
+
+def scale_to_integers(values, scale, convert):
+    """
+    Scales an array of decimal values into whole numbers with floating
+    point, giving the same results as convert does for each value. The
+    values too close to halfway between two whole numbers for floating
+    point to decide which way they round are passed to convert.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * scale
+    result = np.round(scaled).astype(np.int64)
+    halfway = near_rounding_boundary(np.abs(scaled), ROUND_HALF_UP)
+    for index in np.flatnonzero(halfway).tolist():
+        result.flat[index] = convert(values.flat[index].item())
+    return result
+
+
+def portfolio_to_cents(amounts):
+    """
+    Converts an array of euro amounts into whole numbers of cents,
+    rounded as to_cents rounds each amount
+    """
+    return scale_to_integers(amounts, 100, to_cents)
+
+
+def portfolio_to_scaled_apr(apr):
+    """
+    Converts an array of APRs in percent into APR_SCALE-ths of a percent,
+    rounded as to_scaled_apr rounds each APR
+    """
+    return scale_to_integers(apr, APR_SCALE, to_scaled_apr)
+
+
+def iter_portfolio_months(principal, apr, length_of_mortgage,
+                          monthly_payment, extra_monthly_principal=0,
+                          rounding=DEFAULT_ROUNDING, first_month=1,
+                          last_month=None):
+    """
+    Calculates the schedules of many loans in cents with int64 arrays,
+    one month at a time across every loan still being paid. Yields the
+    index of every loan paid in a month and a Schedule of their rows.
+
+    As in cents_schedule, with first_month and last_month only those
+    months are calculated, and principal is the balance left before
+    first_month. Both can be one month or a month for each loan.
+    """
+    principal = np.asarray(principal, dtype=np.int64)
+    loans = len(principal)
+    apr, total_payments, monthly_payment, extra_monthly_principal, \
+        first_month = (
+            np.broadcast_to(np.asarray(values, dtype=np.int64), (loans,))
+            for values in (apr, np.asarray(length_of_mortgage) * 12,
+                           monthly_payment, extra_monthly_principal,
+                           first_month)
+        )
+    paying = (principal > 0) & (first_month <= total_payments)
+    if last_month is not None:
+        last_month = np.broadcast_to(
+            np.asarray(last_month, dtype=np.int64), (loans,))
+        paying &= first_month <= last_month
+    index = np.flatnonzero(paying)
+    balance = principal[index]
+    # The terms of the loans still being paid, compacted as loans finish
+    terms = [values[index] for values in (
+        apr, total_payments, monthly_payment, extra_monthly_principal,
+        first_month - 1)]
+    if last_month is not None:
+        terms.append(last_month[index])
+    elapsed = 0
+    while len(index):
+        elapsed += 1
+        apr, total_payments, monthly_payment, extra_monthly_principal, \
+            month = terms[:5]
+        month = month + elapsed
+        interest = divide(balance * apr, MONTHLY_DIVISOR, rounding)
+        due = balance + interest
+        payment = np.minimum(monthly_payment, due)
+        extra = np.minimum(extra_monthly_principal, due - payment)
+        final = total_payments == month
+        if final.any():
+            payment[final] = due[final]
+            extra[final] = 0
+        balance = due - payment - extra
+        yield index, Schedule(month, payment, payment - interest, extra,
+                              interest, balance)
+        paying = balance > 0
+        if last_month is not None:
+            paying &= month < terms[5]
+        if not paying.all():
+            index = index[paying]
+            balance = balance[paying]
+            terms = [values[paying] for values in terms]
+
+
+def portfolio_cents_schedules(principal, apr, length_of_mortgage,
+                              monthly_payment, extra_monthly_principal=0,
+                              rounding=DEFAULT_ROUNDING):
+    """
+    Calculates the schedules of many loans in cents. Returns the index of
+    the loan of every row and the Schedule, stacked one loan after
+    another - the first rows are the first loan, and so on. The rows are
+    the same as cents_schedule gives for each loan.
+    """
+    months = list(iter_portfolio_months(principal, apr, length_of_mortgage,
+                                        monthly_payment,
+                                        extra_monthly_principal, rounding))
+    if not months:
+        return (np.zeros(0, dtype=np.int64),
+                Schedule(*(np.zeros(0, dtype=np.int64) for _ in range(6))))
+    loan = np.concatenate([index for index, _ in months])
+    columns = [np.concatenate(column)
+               for column in zip(*(rows for _, rows in months))]
+    # Orders the rows loan by loan, keeping each loan's months in order
+    order = np.argsort(loan, kind="stable")
+    return loan[order], Schedule(*(column[order] for column in columns))
+
+
+def portfolio_cents_totals(principal, apr, length_of_mortgage,
+                           monthly_payment, extra_monthly_principal=0,
+                           rounding=DEFAULT_ROUNDING):
+    """
+    Returns the number of months every loan is paid for and the interest
+    paid on it in cents, without keeping the rows of the schedules
+    """
+    principal = np.asarray(principal, dtype=np.int64)
+    months = np.zeros(len(principal), dtype=np.int64)
+    interest = np.zeros(len(principal), dtype=np.int64)
+    paid = paying = None
+    for index, rows in iter_portfolio_months(principal, apr,
+                                             length_of_mortgage,
+                                             monthly_payment,
+                                             extra_monthly_principal,
+                                             rounding):
+        # Sums the interest of the loans still being paid, compacted like
+        # the loans in iter_portfolio_months, and only writes the totals
+        # out when a loan is paid off
+        paid = rows.interest.copy() if paid is None else (
+            paid[paying] if len(paid) != len(index) else paid
+        ) + rows.interest
+        paying = rows.balance > 0
+        if not paying.all():
+            finished = ~paying
+            months[index[finished]] = rows.month[finished]
+            interest[index[finished]] = paid[finished]
+    return months, interest
+
+
+def format_cents(cents, prefix="€"):
+    """
+    Formats a number of cents as a euro amount, like format_euro, with
+    integer arithmetic. Amounts under €1,000,000 have at most one
+    thousands separator, which is put in without the slower grouped
+    format.
+    """
+    sign = ""
+    if cents < 0:
+        sign, cents = "-", -cents
+    euros, cents = divmod(cents, 100)
+    if euros < 1000:
+        return f"{prefix}{sign}{euros}.{CENT_DIGITS[cents]}"
+    if euros < 1000000:
+        thousands, euros = divmod(euros, 1000)
+        return (f"{prefix}{sign}{thousands},{THOUSAND_DIGITS[euros]}."
+                f"{CENT_DIGITS[cents]}")
+    return f"{prefix}{sign}{euros:,}.{CENT_DIGITS[cents]}"
@@ -0,0 +1,520 @@
+"""
+Mortgage class for the Mortgage Comparison Tool
+"""
+import itertools
+import math
+import threading
+
+import numpy as np
+
+import calculations
+import money
+from instrumentation import timed
+from storage import get_store
+
+mortgage_store = get_store()
+
+AMORTIZATION_HEADERS = [
+    "Month",
+    "Pmts Left",
+    "Payment",
+    "Principal",
+    "Interest",
+    "Balance"
+]
+EXTRA_PRINCIPAL_HEADERS = [
+    "Mon.",
+    "Payment",
+    "Principal",
+    "Xtra Princ",
+    "Interest",
+    "Balance"
+]
+
+
+def normalize_rate_changes(rate_changes):
+    """
+    Turns rate changes, given as a dictionary or pairs of the month the
+    new APR is first charged and the APR, into a tuple of (month, apr)
+    pairs in month order
+    """
+    if isinstance(rate_changes, dict):
+        rate_changes = rate_changes.items()
+    changes = tuple(sorted((int(month), float(apr))
+                           for month, apr in rate_changes))
+    months = [month for month, _ in changes]
+    if len(set(months)) != len(months):
+        raise ValueError("the APR can only change once in a month")
+    for month, apr in changes:
+        if month < 2:
+            raise ValueError("a rate change must be from month 2 onwards")
+        if not 0 < apr < 100:
+            raise ValueError("apr must be greater than 0 but less than 100")
+    return changes
+
+
+def arm_rate_changes(rates, fixed_years, reset_years=1):
+    """
+    Creates the rate changes of an adjustable-rate mortgage that is fixed
+    for fixed_years and then charges each of rates for reset_years, as
+    in a 5/1 ARM with fixed_years=5
+    """
+    return normalize_rate_changes(
+        (fixed_years * 12 + 1 + index * reset_years * 12, apr)
+        for index, apr in enumerate(rates)
+    )
+
+
+class MortgageCalculations:
+    """
+    Calculations shared by Mortgage and the Portfolio's MortgageView,
+    which provide the loan terms as attributes
+    """
+
+    __slots__ = ()
+    # Rounding of the monthly payment and interest in the cent schedules
+    rounding = money.DEFAULT_ROUNDING
+    rate_changes = ()
+
+    def _cache_entries(self):
+        """
+        Returns the dictionary calculation results are cached in, a new
+        one every time for loans that are not cached
+        """
+        return {}
+
+    def _cached(self, key, calculate):
+        """
+        Returns a calculation result from the cache, calculating it the
+        first time
+        """
+        cache = self._cache_entries()
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = calculate()
+            return value
+
+    def _fixed_rate_only(self, calculation):
+        """Refuses a closed-form calculation for a variable-rate loan"""
+        if self.rate_changes:
+            raise ValueError(f"{calculation} only covers fixed-rate loans, "
+                             "use cents_schedule for rate_changes")
+
+    def details(self):
+        """Displays the Mortgage Profile Details"""
+        return f"\nMORTGAGE: {self.mortgage_name} \nPrincipal: €{self.principal} \nLength of Mortgage: {self.length_of_mortgage} years \nAnnual Percentage Rate: {self.apr}%"
+
+    @timed()
+    def calculate_monthly_payment(self):
+        """Calculates the monthly payments"""
+        return self._cached(
+            "monthly_payment",
+            lambda: money.monthly_payment_cents(
+                money.to_cents(self.principal),
+                money.to_scaled_apr(self.apr),
+                self.length_of_mortgage,
+                self.rounding,
+            ) / 100,
+        )
+
+    @timed()
+    def calculate_lifetime_interest(self):
+        """
+        Calculates the liftetime interest or cost of a loan, as the
+        interest of its schedule in cents
+        """
+        if self.rate_changes:
+            return self._cached(
+                "lifetime_interest",
+                lambda: int(self.cents_schedule(include_extra=False)
+                            .interest.sum()) / 100,
+            )
+        return self._cached(
+            "lifetime_interest",
+            lambda: money.schedule_interest_cents(
+                money.to_cents(self.principal),
+                money.to_scaled_apr(self.apr),
+                self.length_of_mortgage,
+                self.rounding,
+            ) / 100,
+        )
+
+    @timed()
+    def get_table_values(self):
+        """Creates mortgage values for comparison table"""
+        row = [
+            self.mortgage_name,
+            "€{:,.2f}".format(self.principal),
+            self.apr,
+            self.length_of_mortgage,
+            "€{:,.2f}".format(self.calculate_monthly_payment()),
+            "€{:,.2f}".format(self.calculate_lifetime_interest()),
+        ]
+        return row
+
+    @timed()
+    def amortization_arrays(self):
+        """
+        Calculates the numeric amortization schedule for a loan, including
+        any extra monthly principal, as NumPy arrays. Fixed-rate loans only.
+        """
+        self._fixed_rate_only("amortization_arrays")
+        return self._cached(
+            "amortization_arrays",
+            lambda: calculations.cached_amortization_arrays(
+                self.principal,
+                self.apr,
+                self.length_of_mortgage,
+                self.calculate_monthly_payment(),
+                self.extra_monthly_principal,
+            ),
+        )
+
+    @timed()
+    def extra_principal_payments(self):
+        """
+        Calculates an updated Amorization Schedule when extra principal are
+        applied to a loan.
+        """
+        return self._cached(
+            "extra_principal_payments",
+            lambda: [EXTRA_PRINCIPAL_HEADERS]
+            + list(self.iter_extra_principal_payments()),
+        )
+
+    @timed()
+    def cents_schedule(self, include_extra=True):
+        """
+        Calculates the amortization schedule for a loan in whole cents,
+        ending with the final payment that clears the balance. A loan with
+        rate_changes is re-amortized at each change.
+        """
+        if self.rate_changes:
+            return self.rate_change_schedule(include_extra)
+
+        def calculate():
+            principal = money.to_cents(self.principal)
+            apr = money.to_scaled_apr(self.apr)
+            return money.cents_schedule(
+                principal,
+                apr,
+                self.length_of_mortgage,
+                money.monthly_payment_cents(principal, apr,
+                                            self.length_of_mortgage,
+                                            self.rounding),
+                money.to_cents(self.extra_monthly_principal)
+                if include_extra else 0,
+                self.rounding,
+            )
+
+        return self._cached(("cents_schedule", include_extra), calculate)
+
+    @timed()
+    def rate_change_schedule(self, include_extra=True):
+        """
+        Calculates the schedule in cents of a variable-rate loan. At each
+        of the rate_changes the balance left is re-amortized at the new
+        APR over the rest of the term. The months up to a change are
+        reused from the schedules already calculated with the same
+        earlier changes, so changing a later rate only calculates the
+        months from that change onwards.
+        """
+        total_payments = self.length_of_mortgage * 12
+        resets = ((1, self.apr),) + tuple(
+            change for change in self.rate_changes
+            if change[0] <= total_payments
+        )
+        extra = (money.to_cents(self.extra_monthly_principal)
+                 if include_extra else 0)
+        balance = money.to_cents(self.principal)
+        segments = []
+        for index, (month, _) in enumerate(resets):
+            if balance <= 0:
+                break
+            last_month = (resets[index + 1][0] - 1 if index + 1 < len(resets)
+                          else total_payments)
+            segment = self._rate_segment(resets[:index + 1], balance,
+                                         last_month, extra, include_extra)
+            segments.append(segment)
+            balance = int(segment.balance[-1])
+        return calculations.Schedule(*(np.concatenate(columns)
+                                       for columns in zip(*segments)))
+
+    def _rate_segment(self, resets, balance, last_month, extra,
+                      include_extra):
+        """
+        Returns the months from the last of resets to last_month. Each
+        segment is cached as far as it has been calculated, and only
+        recalculated when a later month than that is needed.
+        """
+        cache = self._cache_entries()
+        key = ("rate_segment", include_extra, resets)
+        first_month, apr = resets[-1]
+        segment = cache.get(key)
+        if segment is None or (segment.month[-1] < last_month
+                               and segment.balance[-1] > 0):
+            apr = money.to_scaled_apr(apr)
+            payment = money.payment_cents(
+                balance, apr,
+                self.length_of_mortgage * 12 - first_month + 1,
+                self.rounding,
+            )
+            segment = cache[key] = money.cents_schedule(
+                balance, apr, self.length_of_mortgage, payment, extra,
+                self.rounding, first_month, last_month,
+            )
+        months = last_month - first_month + 1
+        return calculations.Schedule(*(column[:months]
+                                       for column in segment))
+
+    def iter_extra_principal_payments(self):
+        """
+        Yields the rows of the updated Amortization Schedule one at a time,
+        formatting each row only when it is reached
+        """
+        schedule = self.cents_schedule()
+        # Every payment and extra payment but the last is the same, so
+        # they are only formatted once
+        payment_text = extra_text = None
+        if len(schedule.month):
+            monthly_payment = int(schedule.payment[0])
+            extra_monthly_principal = int(schedule.extra[0])
+            payment_text = money.format_cents(monthly_payment)
+            extra_text = money.format_cents(extra_monthly_principal)
+        for row in zip(*(column.tolist() for column in schedule)):
+            month, payment, principal, extra, interest, balance = row
+            yield [
+                month,
+                payment_text if payment == monthly_payment
+                else money.format_cents(payment),
+                money.format_cents(principal),
+                extra_text if extra == extra_monthly_principal
+                else money.format_cents(extra),
+                money.format_cents(interest),
+                money.format_cents(balance),
+            ]
+
+    @timed()
+    def calculate_amortization_schedule(self):
+        """Calculates the amortization schedule for a loan"""
+        return self._cached(
+            "amortization_schedule",
+            lambda: [AMORTIZATION_HEADERS]
+            + list(self.iter_amortization_schedule()),
+        )
+
+    def iter_amortization_schedule(self):
+        """
+        Yields the rows of the amortization schedule one at a time,
+        formatting each row only when it is reached
+        """
+        schedule = self.cents_schedule(include_extra=False)
+        total_payments = len(schedule.month)
+        # Every payment but the last is the same, so it is only formatted
+        # once
+        payment_text = None
+        if total_payments:
+            monthly_payment = int(schedule.payment[0])
+            payment_text = money.format_cents(monthly_payment, " €")
+        for month, payment, principal, _, interest, balance in zip(
+            *(column.tolist() for column in schedule)
+        ):
+            yield [
+                month,
+                total_payments - month,
+                payment_text if payment == monthly_payment
+                else money.format_cents(payment, " €"),
+                money.format_cents(principal, " €"),
+                money.format_cents(interest, " €"),
+                money.format_cents(balance, " €"),
+            ]
+
+    def _payoff_terms(self):
+        """
+        Returns the principal, scaled APR and monthly payment in cents of a
+        fixed-rate loan, and the interest in cents of its schedule without
+        overpayments
+        """
+        principal = money.to_cents(self.principal)
+        apr = money.to_scaled_apr(self.apr)
+        return (
+            principal,
+            apr,
+            money.monthly_payment_cents(principal, apr,
+                                        self.length_of_mortgage,
+                                        self.rounding),
+            money.schedule_interest_cents(principal, apr,
+                                          self.length_of_mortgage,
+                                          self.rounding),
+        )
+
+    @timed()
+    def calculate_early_payoff(self, extra_monthly_principal=None,
+                               lump_payment=0):
+        """
+        Calculates when the loan is paid off, and the interest saved, with
+        extra monthly principal (this mortgage's own by default) and/or a
+        lump principal payment at the start, from its schedule in cents
+        with the same monthly payment. Fixed-rate loans only.
+        """
+        self._fixed_rate_only("calculate_early_payoff")
+        if extra_monthly_principal is None:
+            extra_monthly_principal = self.extra_monthly_principal
+        principal, apr, monthly_payment, original_interest = (
+            self._payoff_terms()
+        )
+        schedule = money.cents_schedule(
+            max(principal - money.to_cents(lump_payment), 0),
+            apr,
+            self.length_of_mortgage,
+            monthly_payment,
+            money.to_cents(extra_monthly_principal),
+            self.rounding,
+        )
+        payoff_month = len(schedule.month)
+        interest_paid = int(schedule.interest.sum())
+        return calculations.EarlyPayoff(
+            payoff_month,
+            self.length_of_mortgage * 12 - payoff_month,
+            interest_paid / 100,
+            (original_interest - interest_paid) / 100,
+        )
+
+    @timed()
+    def sweep_early_payoff(self, extra_monthly_principal=0, lump_payment=0):
+        """
+        Batch form of calculate_early_payoff - takes arrays of extra monthly
+        principal and/or lump payment amounts and returns arrays of
+        results, calculated for every amount at once in cents
+        """
+        self._fixed_rate_only("sweep_early_payoff")
+        extra_monthly_principal, lump_payment = np.broadcast_arrays(
+            money.portfolio_to_cents(extra_monthly_principal),
+            money.portfolio_to_cents(lump_payment),
+        )
+        shape = extra_monthly_principal.shape
+        principal, apr, monthly_payment, original_interest = (
+            self._payoff_terms()
+        )
+        payoff_month, interest_paid = money.portfolio_cents_totals(
+            np.maximum(principal - lump_payment.ravel(), 0),
+            apr,
+            self.length_of_mortgage,
+            monthly_payment,
+            extra_monthly_principal.ravel(),
+            self.rounding,
+        )
+        payoff_month = payoff_month.reshape(shape)
+        interest_paid = interest_paid.reshape(shape)
+        return calculations.EarlyPayoff(
+            payoff_month,
+            self.length_of_mortgage * 12 - payoff_month,
+            interest_paid / 100,
+            (original_interest - interest_paid) / 100,
+        )
+
+    @timed()
+    def create_mortgage_data(self):
+        """
+        Creates a string of mortgage data for a Mortgage Profile to
+        export to Google Sheets
+        """
+        monthly_payment = self.calculate_monthly_payment()
+        interest = self.calculate_lifetime_interest()
+        data = [
+            self.principal,
+            self.apr,
+            self.length_of_mortgage,
+            monthly_payment,
+            interest,
+        ]
+        return data
+
+    @timed()
+    def update_mortgage_data(self):
+        """Exports the data for a mortgage to the mortgage data storage"""
+        data = self.create_mortgage_data()
+        mortgage_store.append(data)
+
+    @timed()
+    def calculate_mortgage_metrics(self):
+        """
+        Calculate the average principal, APR, loan length, monthly payment, and
+        lifetime interest amount from aggregate data collected from all
+        mortgage data stored by the mortgage data storage backend
+        """
+        metrics = mortgage_store.metrics()
+        mortgage_data = [math.ceil(avg) for avg in metrics.means()]
+        return mortgage_data
+
+
+class Mortgage(MortgageCalculations):
+    """
+    Base Class for Mortgages - creates a mortgage class instance
+    """
+
+    # Slotted instances have no per-instance __dict__, which keeps the
+    # memory used by large numbers of mortgages down
+    __slots__ = (
+        "principal",
+        "apr",
+        "length_of_mortgage",
+        "mortgage_name",
+        "mortgage_ID",
+        "start_year",
+        "extra_monthly_principal",
+        "updated_total_payments",
+        "rate_changes",
+        "rounding",
+        "_cache",
+    )
+    _mortgage_IDs = itertools.count(1)
+    _mortgage_ID_lock = threading.Lock()
+    # Changing any of these attributes clears the cached calculations
+    LOAN_TERMS = frozenset(
+        ["principal", "apr", "length_of_mortgage", "extra_monthly_principal",
+         "rounding"]
+    )
+
+    def __init__(self, principal, apr, length_of_mortgage, mortgage_name,
+                 extra_monthly_principal=0, mortgage_ID=None,
+                 rounding=money.DEFAULT_ROUNDING):
+        # instance attribute
+        self.principal = principal
+        self.apr = apr
+        self.length_of_mortgage = length_of_mortgage
+        self.mortgage_name = mortgage_name
+        if mortgage_ID is None:
+            with Mortgage._mortgage_ID_lock:
+                mortgage_ID = next(Mortgage._mortgage_IDs)
+        self.mortgage_ID = mortgage_ID
+        self.start_year = 0  # start of mortgage
+        self.extra_monthly_principal = extra_monthly_principal
+        self.updated_total_payments = 0
+        self.rate_changes = ()
+        self.rounding = rounding
+
+    def __setattr__(self, name, value):
+        if name == "rounding" and value not in money.ROUNDING_MODES:
+            raise ValueError(
+                f"rounding must be one of {money.ROUNDING_MODES}"
+            )
+        if name in Mortgage.LOAN_TERMS:
+            object.__setattr__(self, "_cache", None)
+        elif name == "rate_changes":
+            value = normalize_rate_changes(value)
+            # The segments cached for each set of earlier rate changes stay
+            # valid, every other result depends on all of the changes
+            if self._cache:
+                object.__setattr__(self, "_cache", {
+                    key: cached for key, cached in self._cache.items()
+                    if key[0] == "rate_segment"
+                })
+        object.__setattr__(self, name, value)
+
+    def _cache_entries(self):
+        """Returns the calculation results cached on this mortgage"""
+        if self._cache is None:
+            object.__setattr__(self, "_cache", {})
+        return self._cache
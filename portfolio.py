@@ -0,0 +1,172 @@
+"""
+Portfolio of mortgages held as columns of NumPy arrays so that payments,
+interest and comparison rows are calculated for every loan at once.
+"""
+import numpy as np
+
+import calculations
+import money
+from mortgage import MortgageCalculations
+
+
+class Portfolio:
+    """
+    Columnar collection of loans - principal, APR, loan length and extra
+    monthly principal are each stored as one contiguous typed array across
+    all of the loans in the portfolio
+    """
+
+    def __init__(self, principal, apr, length_of_mortgage,
+                 mortgage_names=None, extra_monthly_principal=None,
+                 mortgage_IDs=None):
+        self.principal = np.asarray(principal, dtype=np.float64)
+        self.apr = np.asarray(apr, dtype=np.float64)
+        self.length_of_mortgage = np.asarray(length_of_mortgage,
+                                             dtype=np.int64)
+        if extra_monthly_principal is None:
+            extra_monthly_principal = np.zeros(len(self.principal))
+        self.extra_monthly_principal = np.asarray(extra_monthly_principal,
+                                                  dtype=np.float64)
+        if mortgage_IDs is None:
+            mortgage_IDs = np.arange(1, len(self.principal) + 1)
+        self.mortgage_ID = np.asarray(mortgage_IDs, dtype=np.int64)
+        if mortgage_names is None:
+            mortgage_names = [""] * len(self.principal)
+        self.mortgage_name = list(mortgage_names)
+        # Rounding of the monthly payments and interest of every loan
+        self.rounding = money.DEFAULT_ROUNDING
+
+    @classmethod
+    def from_mortgages(cls, mortgages):
+        """Creates a Portfolio from Mortgage class instances"""
+        mortgages = list(mortgages)
+        return cls(
+            [mortgage.principal for mortgage in mortgages],
+            [mortgage.apr for mortgage in mortgages],
+            [mortgage.length_of_mortgage for mortgage in mortgages],
+            [mortgage.mortgage_name for mortgage in mortgages],
+            [mortgage.extra_monthly_principal for mortgage in mortgages],
+            [mortgage.mortgage_ID for mortgage in mortgages],
+        )
+
+    def __len__(self):
+        return len(self.principal)
+
+    def __getitem__(self, index):
+        """Returns a MortgageView of one loan in the portfolio"""
+        if not -len(self) <= index < len(self):
+            raise IndexError("portfolio index out of range")
+        return MortgageView(self, index % len(self))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield MortgageView(self, index)
+
+    def cents_terms(self, include_extra=True):
+        """
+        Returns the principal, scaled APR, length, monthly payment and extra
+        monthly principal of every loan as the money engine takes them, in
+        cents
+        """
+        principal = money.portfolio_to_cents(self.principal)
+        apr = money.portfolio_to_scaled_apr(self.apr)
+        return (
+            principal,
+            apr,
+            self.length_of_mortgage,
+            money.portfolio_monthly_payment_cents(
+                principal, apr, self.length_of_mortgage, self.rounding
+            ),
+            money.portfolio_to_cents(self.extra_monthly_principal)
+            if include_extra else np.zeros(len(self), dtype=np.int64),
+        )
+
+    def calculate_monthly_payments(self):
+        """Calculates the monthly payment of every loan"""
+        return money.portfolio_monthly_payment_cents(
+            money.portfolio_to_cents(self.principal),
+            money.portfolio_to_scaled_apr(self.apr),
+            self.length_of_mortgage,
+            self.rounding,
+        ) / 100
+
+    def calculate_lifetime_interest(self, monthly_payments=None):
+        """
+        Calculates the lifetime interest or cost of every loan, as the
+        interest of its schedule in cents
+        """
+        principal, apr, length_of_mortgage, payments, _ = self.cents_terms(
+            include_extra=False
+        )
+        if monthly_payments is not None:
+            payments = money.portfolio_to_cents(monthly_payments)
+        _, interest = money.portfolio_cents_totals(
+            principal, apr, length_of_mortgage, payments, 0, self.rounding
+        )
+        return interest / 100
+
+    def get_table_values(self):
+        """Creates the comparison table rows for every loan"""
+        monthly_payments = self.calculate_monthly_payments()
+        lifetime_interest = self.calculate_lifetime_interest(monthly_payments)
+        rows = []
+        for name, principal, apr, length, payment, interest in zip(
+            self.mortgage_name,
+            self.principal.tolist(),
+            self.apr.tolist(),
+            self.length_of_mortgage.tolist(),
+            monthly_payments.tolist(),
+            lifetime_interest.tolist(),
+        ):
+            rows.append(
+                [
+                    name,
+                    calculations.format_euro(principal),
+                    apr,
+                    length,
+                    calculations.format_euro(payment),
+                    calculations.format_euro(interest),
+                ]
+            )
+        return rows
+
+
+def _column(name):
+    """
+    Creates a property that reads and writes one loan's value in a
+    Portfolio column
+    """
+
+    def get_value(view):
+        value = getattr(view._portfolio, name)[view._index]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def set_value(view, value):
+        getattr(view._portfolio, name)[view._index] = value
+
+    return property(get_value, set_value)
+
+
+class MortgageView(MortgageCalculations):
+    """
+    Lightweight view of one loan in a Portfolio. It has all of the
+    Mortgage methods but reads its values from the Portfolio columns
+    instead of storing its own copy. Nothing is cached on a view, so the
+    results always follow the columns.
+    """
+
+    __slots__ = ("_portfolio", "_index")
+    start_year = 0
+    updated_total_payments = 0
+
+    principal = _column("principal")
+    apr = _column("apr")
+    length_of_mortgage = _column("length_of_mortgage")
+    extra_monthly_principal = _column("extra_monthly_principal")
+    mortgage_name = _column("mortgage_name")
+    mortgage_ID = _column("mortgage_ID")
+    rounding = property(lambda view: view._portfolio.rounding)
+
+    def __init__(self, portfolio, index):
+        self._portfolio = portfolio
+        self._index = index
@@ -0,0 +1,71 @@
+"""
+Registry of the mortgages a user saved during a session.
+"""
+import itertools
+import threading
+
+
+class MortgageRegistry:
+    """
+    Saved mortgages of one session, indexed by mortgage number and by
+    name. Mortgage numbers are handed out and mortgages saved under a
+    lock, so a registry can be shared between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._IDs = itertools.count(1)
+        self._by_ID = {}
+        self._by_name = {}
+
+    def next_ID(self):
+        """Returns the next unused mortgage number"""
+        with self._lock:
+            return next(self._IDs)
+
+    def add(self, mortgage):
+        """Saves a mortgage under its mortgage number and name"""
+        with self._lock:
+            previous = self._by_ID.get(mortgage.mortgage_ID)
+            if previous is not None:
+                self._remove_name(previous)
+            self._by_ID[mortgage.mortgage_ID] = mortgage
+            self._by_name.setdefault(mortgage.mortgage_name, {})[
+                mortgage.mortgage_ID] = mortgage
+
+    def remove(self, mortgage_ID):
+        """Removes a saved mortgage and returns it"""
+        with self._lock:
+            mortgage = self._by_ID.pop(mortgage_ID)
+            self._remove_name(mortgage)
+            return mortgage
+
+    def _remove_name(self, mortgage):
+        named = self._by_name[mortgage.mortgage_name]
+        del named[mortgage.mortgage_ID]
+        if not named:
+            del self._by_name[mortgage.mortgage_name]
+
+    def get(self, mortgage_ID, default=None):
+        """Returns the mortgage saved under a mortgage number"""
+        return self._by_ID.get(mortgage_ID, default)
+
+    def by_name(self, mortgage_name):
+        """Returns the saved mortgages with a name, oldest first"""
+        with self._lock:
+            return list(self._by_name.get(mortgage_name, {}).values())
+
+    def __getitem__(self, mortgage_ID):
+        return self._by_ID[mortgage_ID]
+
+    def __contains__(self, mortgage_ID):
+        return mortgage_ID in self._by_ID
+
+    def __len__(self):
+        return len(self._by_ID)
+
+    def __iter__(self):
+        """Iterates over the saved mortgages in the order they were saved"""
+        with self._lock:
+            mortgages = list(self._by_ID.values())
+        return iter(mortgages)
@@ -1,38 +1,72 @@
 """
 Libraries and Imports
 """
-import gspread
-from google.oauth2.service_account import Credentials
+import functools
+import itertools
 import math
+import os
+import sqlite3
 import sys
 from colorama import init
 from termcolor import cprint
-import pyfiglet
-from tabulate import tabulate
-import os
-
-init(strip=not sys.stdout.isatty())  # strip colors if stdout is redirected
-
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive",
-]
-
-CREDS = Credentials.from_service_account_file("creds.json")
-SCOPED_CREDS = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
-SHEET = GSPREAD_CLIENT.open("mortgage_calculator")
-
-
-mortgage_dict = {}
+from instrumentation import span, timed
+from io_loop import TIMEOUT_ERRORS
+from mortgage import (
+    AMORTIZATION_HEADERS,
+    EXTRA_PRINCIPAL_HEADERS,
+    Mortgage,
+    mortgage_store,
+)
+from portfolio import Portfolio
+from scenarios import (
+    SCENARIO_HEADERS,
+    best_scenario_by_apr,
+    get_scenario_table,
+    rank_scenarios,
+    sweep_overpayment_scenarios,
+)
+from session import current_session
+from sheets import retry_errors
+
+BANNER_TEXT = "Mortgage\nCalculator"
+# The figlet banner rendered ahead of time, so pyfiglet is only imported
+# when this file is missing
+BANNER_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "banner.txt")
+
+# Table rows per page so that a page and its prompt fit in the 24 row
+# terminal
+SCHEDULE_PAGE_SIZE = 20
 
 
 def clear_screen():
     """
     Function to clear terminal through the game.
     """
-    os.system("cls" if os.name == "nt" else "clear")
+    # Written to stdout rather than run as a "clear" command, so that it
+    # clears the terminal of the session that is running
+    print("\033[H\033[2J\033[3J", end="", flush=True)
+
+
+@functools.lru_cache(maxsize=None)
+def get_banner():
+    """
+    Returns the figlet banner from the banner cache, rendering and saving
+    it only if the cache is missing
+    """
+    try:
+        with open(BANNER_CACHE, encoding="utf-8") as file:
+            return file.read()
+    except OSError:
+        pass
+    import pyfiglet
+    banner = pyfiglet.figlet_format(BANNER_TEXT)
+    try:
+        with open(BANNER_CACHE, "w", encoding="utf-8") as file:
+            file.write(banner)
+    except OSError:
+        pass
+    return banner
 
 
 def welcome_screen():
@@ -40,7 +74,7 @@ def welcome_screen():
     ASCII PIXEL ART CODE
     """
     clear_screen()
-    logo_text = pyfiglet.figlet_format("Mortgage\nCalculator")
+    logo_text = get_banner()
     cprint(logo_text, "light_cyan")
     print("Welcome to my Mortgage Comparison Tool\n")
     proceed = input("Press the enter key to proceed \n").lower()
@@ -84,179 +118,6 @@ of the mortgages entered into this program.
     print(data_analysis_text)
 
 
-class Mortgage:
-    """
-    Base Class for Mortgages - creates a mortgage class instance
-    """
-
-    mortgage_ID = 0
-    start_year = 0  # start of mortgage
-    extra_monthly_principal = 0
-    updated_total_payments = 0
-
-    def __init__(self, principal, apr, length_of_mortgage, mortgage_name):
-        # instance attribute
-        self.principal = principal
-        self.apr = apr
-        self.length_of_mortgage = length_of_mortgage
-        self.mortgage_name = mortgage_name
-        Mortgage.mortgage_ID += 1
-        self.mortgage_ID = Mortgage.mortgage_ID
-        self.start_year = Mortgage.start_year
-        self.extra_monthly_principal = Mortgage.extra_monthly_principal
-        self.updated_total_payments = Mortgage.updated_total_payments
-
-    def details(self):
-        """Displays the Mortgage Profile Details"""
-        return f"\nMORTGAGE: {self.mortgage_name} \nPrincipal: €{self.principal} \nLength of Mortgage: {self.length_of_mortgage} years \nAnnual Percentage Rate: {self.apr}%"
-
-    def calculate_monthly_payment(self):
-        """Calculates the monthly payments"""
-        monthly_payment = round(
-            ((self.apr / 100 / 12) * self.principal)
-            / (
-                1
-                - (
-                    math.pow(
-                        (1 + (self.apr / 100 / 12)), (-self.length_of_mortgage * 12)
-                    )
-                )
-            ),
-            2,
-        )
-        return monthly_payment
-
-    def calculate_lifetime_interest(self):
-        """Calculates the liftetime interest or cost of a loan"""
-        total_interest = round(
-            (self.length_of_mortgage * 12 * self.calculate_monthly_payment())
-            - self.principal,
-            2,
-        )
-        return total_interest
-
-    def get_table_values(self):
-        """Creates mortgage values for comparison table"""
-        row = [
-            self.mortgage_name,
-            "€{:,.2f}".format(self.principal),
-            self.apr,
-            self.length_of_mortgage,
-            "€{:,.2f}".format(self.calculate_monthly_payment()),
-            "€{:,.2f}".format(self.calculate_lifetime_interest()),
-        ]
-        return row
-
-    def extra_principal_payments(self):
-        """
-        Calculates an updated Amorization Schedule when extra principal are
-        applied to a loan.
-        """
-        updated_schedule = [
-            [
-                "Mon.",
-                "Payment",
-                "Principal",
-                "Xtra Princ",
-                "Interest",
-                "Balance"
-                ]
-        ]
-        balance = self.principal
-        rate = self.apr / 100 / 12
-        total_payments = self.length_of_mortgage * 12
-        monthly_payment = self.calculate_monthly_payment()
-        extra_monthly_principal = self.extra_monthly_principal
-        for Month in range(1, total_payments):
-            interest_payment = balance * rate
-            principal_payment = monthly_payment - interest_payment
-            new_principal_payment = principal_payment + extra_monthly_principal
-            balance -= new_principal_payment
-            total_payments -= 1
-            if balance > 0:
-                updated_schedule.append(
-                    [
-                        Month,
-                        "€{:,.2f}".format(monthly_payment),
-                        "€{:,.2f}".format(principal_payment),
-                        "€{:,.2f}".format(extra_monthly_principal),
-                        "€{:,.2f}".format(interest_payment),
-                        "€{:,.2f}".format(balance),
-                    ]
-                )
-        return updated_schedule
-
-    def calculate_amortization_schedule(self):
-        """Calculates the amortization schedule for a loan"""
-        schedule = [
-            [
-                "Month",
-                "Pmts Left",
-                "Payment",
-                "Principal",
-                "Interest",
-                "Balance"
-                ]
-        ]
-        balance = self.principal
-        rate = self.apr / 100 / 12
-        total_payments = self.length_of_mortgage * 12
-        monthly_payment = self.calculate_monthly_payment()
-        for Month in range(1, total_payments):
-            interest_payment = balance * rate
-            principal_payment = monthly_payment - interest_payment
-            balance -= principal_payment
-            total_payments -= 1
-            schedule.append(
-                [
-                    Month,
-                    total_payments,
-                    " €{:,.2f}".format(monthly_payment),
-                    " €{:,.2f}".format(principal_payment),
-                    " €{:,.2f}".format(interest_payment),
-                    " €{:,.2f}".format(balance),
-                ]
-            )
-        return schedule
-
-    def create_mortgage_data(self):
-        """
-        Creates a string of mortgage data for a Mortgage Profile to
-        export to Google Sheets
-        """
-        monthly_payment = self.calculate_monthly_payment()
-        interest = self.calculate_lifetime_interest()
-        data = [
-            self.principal,
-            self.apr,
-            self.length_of_mortgage,
-            monthly_payment,
-            interest,
-        ]
-        return data
-
-    def update_mortgage_data(self):
-        """Exports the data for a mortgage to Google Sheets"""
-        data = self.create_mortgage_data()
-        mortgage_worksheet = SHEET.worksheet("mortgage_data")
-        mortgage_worksheet.append_row(data)
-
-    def calculate_mortgage_metrics(self):
-        """
-        Calculate the average principal, APR, loan length, monthly payment, and
-        lifetime interest amount from aggregate data collected from all
-        mortgage data stored in Google Sheets
-        """
-        mortgage_data = []
-        mortgage_worksheet = SHEET.worksheet("mortgage_data").get_all_values()
-        for column in mortgage_worksheet:
-            avg = sum([int(y) for y in column]) / (len(mortgage_worksheet))
-            avg = math.ceil(avg)
-            mortgage_data.append(avg)
-
-        return mortgage_data
-
-
 def validate_value(prompt_text):
     """
     Prompts user for input and validates that input is an integer greater
@@ -319,6 +180,25 @@ def validate_name(prompt_text):
     return name
 
 
+def print_paged_schedule(headers, rows, page_size=SCHEDULE_PAGE_SIZE):
+    """
+    Prints a schedule one page at a time. Rows are taken lazily from the
+    schedule so only the rows on the page being shown are formatted.
+    """
+    from tabulate import tabulate
+    rows = iter(rows)
+    page = list(itertools.islice(rows, page_size))
+    while page:
+        with span("render.schedule_page"):
+            table = tabulate(page, headers=headers, tablefmt="github")
+        print(table)
+        page = list(itertools.islice(rows, page_size))
+        if page and input(
+            "Press enter for the next page or enter 'q' to stop: \n"
+        ).strip().lower() == "q":
+            break
+
+
 def display_mortgage_details(mortgage):
     """Displays the details of a Mortgage Profile"""
     print(mortgage.details())
@@ -329,25 +209,32 @@ def display_mortgage_details(mortgage):
     print("\n")
 
 
+def display_early_payoff(payoff):
+    """Displays the shortened length of a loan and the interest saved"""
+    years, months = divmod(payoff.payoff_month, 12)
+    print(f"Paid off in: {years} years {months} months "
+          f"({payoff.months_saved} payments fewer)")
+    print("Interest saved: €{:,.2f}".format(payoff.interest_saved))
+
+
 def display_selected_mortgage(selection):
-    """Creates and displays a list of user-saved Mortgage profiles"""
-    for x in mortgage_dict:
-        if selection == x:
-            display_mortgage_details(mortgage_dict[x])
-            break
-        else:
-            cprint("Please enter a mortgage in the list above.", "light_red")
+    """Displays one of the user-saved Mortgage profiles"""
+    mortgage = current_session().mortgages.get(selection)
+    if mortgage is None:
+        cprint("Please enter a mortgage in the list above.", "light_red")
+    else:
+        display_mortgage_details(mortgage)
 
 
 def adds_mortgage_instance_to_dict(mortgage):
-    """Adds the Mortgage Class Instance to the global mortgage dictionary"""
+    """Adds the Mortgage Class Instance to the session's saved mortgages"""
     while True:
         try:
             answer = str(
                 input("\nWould you like to save this mortgage? Type Y or N \n")
             ).lower()
             if answer == "y":
-                mortgage_dict[mortgage.mortgage_ID] = mortgage
+                current_session().mortgages.add(mortgage)
                 cprint(
                     "\nThanks. Your mortgage has been saved to your mortgages "
                     "in this session.",
@@ -370,35 +257,14 @@ def adds_mortgage_instance_to_dict(mortgage):
             )
 
 
-def calculate_average(data):
-    """
-    - Creates a new list from the items in the last column of
-      Google Sheets data
-    - Removes the Header from the list
-    - Calculates an average of values in the list
-    """
-    column = []
-    for x in data:
-        last_item = x.pop()
-        column.append(last_item)
-
-    column.pop(0)
-
-    total = 0
-    for x in column:
-        total += float(x)
-
-    average = total / len(column)
-    return average
-
-
+@timed("menu.create_mortgage")
 def create_mortgage():
     """
     Creates each Class Instance of a Mortgage
     - Requests user input for the Name, Principal amount, APR amount, and
       Length of Mortgage
     - Creates the Mortgage class instance
-    - Sends that data for storage in Google Sheets
+    - Sends that data for storage (Google Sheets by default)
     - Prints the Mortgage Profile
     - Requests user input to save Mortgage Profile for session
     """
@@ -418,10 +284,10 @@ def create_mortgage():
     )
 
     # Creates a Mortgage Class Instance and adds it to the mortgage dictionary
-    mortgage = Mortgage(principal, apr, length_of_mortgage, mortgage_name)
+    mortgage = Mortgage(principal, apr, length_of_mortgage, mortgage_name,
+                        mortgage_ID=current_session().mortgages.next_ID())
 
-    # Creates a list of the mortgage data that appends to Google Sheets for
-    # future analysis
+    # Creates a list of the mortgage data that is stored for future analysis
     mortgage.update_mortgage_data()
 
     # Prints the Mortgage details just entered
@@ -435,15 +301,17 @@ def create_mortgage():
     print("\n*******************************************************\n")
 
 
+@timed("menu.view_mortgage")
 def view_mortgage():
     """
     Allows user to choose an individual Mortgage Profile to view
     """
     clear_screen()
     cprint("*** VIEW A MORTGAGE *** \n", "light_green")
+    mortgages = current_session().mortgages
 
     # Prints a column of the available Mortgage Class Instances
-    if len(mortgage_dict) == 0:
+    if len(mortgages) == 0:
         cprint(
             "This feature requires you to add at least one mortgage.\n"
             "Add a mortgage to proceed.",
@@ -451,8 +319,9 @@ def view_mortgage():
         )
     else:
         cprint("You have entered the following mortgages:\n", "light_green")
-        for x in mortgage_dict:
-            print(f"Mortgage: # {x}, {mortgage_dict[x].mortgage_name}")
+        for mortgage in mortgages:
+            print(f"Mortgage: # {mortgage.mortgage_ID}, "
+                  f"{mortgage.mortgage_name}")
 
         # Prompts user to select a mortgage to view or user can select to
         # return to main menu
@@ -481,14 +350,17 @@ def view_mortgage():
     print("\n*******************************************************\n")
 
 
+@timed("menu.compare_mortgages")
 def compare_mortgages():
     """
     Displays a comparison table of all the Mortgage Profiles saved by the user
     """
+    from tabulate import tabulate
     clear_screen()
     cprint("*** COMPARE MORTGAGES *** \n", "light_green")
+    mortgages = current_session().mortgages
 
-    if len(mortgage_dict) < 2:
+    if len(mortgages) < 2:
         cprint(
             "This feature requires you to add at least two mortgage.\n"
             "Add mortgages to proceed.",
@@ -507,14 +379,17 @@ def compare_mortgages():
         ]
 
         cprint("\nMORTGAGE COMPARISON TABLE\n", "light_yellow")
-        for x in mortgage_dict:
-            mortgage_table.append(mortgage_dict[x].get_table_values())
+        portfolio = Portfolio.from_mortgages(mortgages)
+        mortgage_table.extend(portfolio.get_table_values())
 
-        print(tabulate(mortgage_table, tablefmt="simple"))
+        with span("render.comparison"):
+            table = tabulate(mortgage_table, tablefmt="simple")
+        print(table)
 
     print("\n******************************************************* \n")
 
 
+@timed("menu.extra_monthly_principal")
 def extra_monthly_principal():
     """
     Calculates a revised Amortization Principal Payment when extra monthly
@@ -560,13 +435,16 @@ def extra_monthly_principal():
     cprint("UPDATED MORTGAGE AMORTIZATION SCHEDULE:", "light_yellow")
 
     print("Extra Monthly Principal Payment: €{:,."
-          "2f}".format(extra_principal), "\n")
-    schedule = mortgage.extra_principal_payments()
-    print(tabulate(schedule, headers="firstrow", tablefmt="github"))
+          "2f}".format(extra_principal))
+    display_early_payoff(mortgage.calculate_early_payoff())
+    print("\n")
+    schedule = mortgage.iter_extra_principal_payments()
+    print_paged_schedule(EXTRA_PRINCIPAL_HEADERS, schedule)
 
     print("\n*******************************************************\n")
 
 
+@timed("menu.lump_payment")
 def lump_payment():
     """
     Calculates new payment and total interest with an extra lump
@@ -613,13 +491,83 @@ def lump_payment():
     display_mortgage_details(new_mortgage)
     print(f"Principal Lump Overpayment: €{lump_payment}")
 
+    # Prints the shortened term if the current monthly payment is kept
+    cprint(
+        "\nKEEPING THE CURRENT PAYMENT: ------------------------------",
+        "light_yellow"
+    )
+    display_early_payoff(
+        mortgage.calculate_early_payoff(lump_payment=lump_payment)
+    )
+
+    print("\n*******************************************************\n")
+
+
+@timed("menu.compare_overpayment_scenarios")
+def compare_overpayment_scenarios():
+    """
+    Compares a grid of extra monthly principal amounts, lump payments,
+    lump payment timings for a mortgage and prints the scenarios that
+    save the most interest for each euro paid in at its APR, followed by
+    the best scenario if the APR were to change
+    """
+    from tabulate import tabulate
+    clear_screen()
+    cprint("Compare Mortgage Overpayment Scenarios:\n", "light_green")
+
+    # Requests User input to create Current Mortgage profile
+    mortgage_name = validate_name(
+        "Enter a name for this mortgage. You can use up to 10 characters. \n"
+    )
+    principal = validate_value(
+        "Enter the remaining principal left on your loan in Euro: \n"
+    )
+    apr = validate_apr()
+    remaining_length_of_mortgage = validate_value(
+        "Enter the remaining length of your mortgage in years: \n"
+    )
+    mortgage = Mortgage(principal, apr, remaining_length_of_mortgage,
+                        mortgage_name)
+
+    cprint("\nCurrent Mortgage: ", "light_yellow")
+    display_mortgage_details(mortgage)
+
+    scenarios = sweep_overpayment_scenarios(
+        mortgage,
+        extra_amounts=range(0, 1001, 50),
+        lump_payments=range(0, 50001, 5000),
+        lump_months=(0, 12, 36, 60),
+        apr_changes=(-1, -0.5, 0, 0.5, 1),
+    )
+    ranked = rank_scenarios(scenarios, top=10, apr=mortgage.apr)
+    shocked = best_scenario_by_apr(scenarios)
+    cprint(
+        f"TOP {len(ranked)} OVERPAYMENT SCENARIOS AT {mortgage.apr}% APR:\n",
+        "light_yellow"
+    )
+    with span("render.scenarios"):
+        table = tabulate(
+            get_scenario_table(scenarios, ranked),
+            headers=SCENARIO_HEADERS,
+            tablefmt="simple"
+        )
+        shocked_table = tabulate(
+            get_scenario_table(scenarios, shocked),
+            headers=SCENARIO_HEADERS,
+            tablefmt="simple"
+        )
+    print(table)
+    cprint("\nIF THE APR CHANGES, THE BEST SCENARIO AT EACH APR:\n", "light_yellow")
+    print(shocked_table)
+
     print("\n*******************************************************\n")
 
 
+@timed("menu.overpayments")
 def overpayments():
     """
     Gives User the selection of making monthly overpayments or
-    lump sum overpayment
+    lump sum overpayment, or comparing overpayment scenarios
     """
     clear_screen()
     cprint("*** MORTGAGE OVERPAYMENTS *** \n", "light_green")
@@ -629,8 +577,9 @@ def overpayments():
             selection = int(
                 input(
                     "Enter 1 for Extra Monthly Principal overpayments, "
-                    "2 for a Lump Principal overpayment, \nor enter '0' "
-                    "to exit this menu: \n"
+                    "2 for a Lump Principal overpayment, \n3 to compare "
+                    "overpayment scenarios, or enter '0' to exit this "
+                    "menu: \n"
                 )
             )
             if selection == 0:
@@ -639,6 +588,8 @@ def overpayments():
                 extra_monthly_principal()
             elif selection == 2:
                 lump_payment()
+            elif selection == 3:
+                compare_overpayment_scenarios()
             else:
                 clear_screen()
                 cprint(
@@ -653,14 +604,16 @@ def overpayments():
     menu_screen()
 
 
+@timed("menu.amortization")
 def amortization():
     """
     Allows user to view an amoritization for individual Mortgage profile
     """
     clear_screen()
     cprint("*** VIEW AN AMORTIZATION FOR A MORTGAGE *** \n", "light_green")
+    mortgages = current_session().mortgages
 
-    if len(mortgage_dict) == 0:
+    if len(mortgages) == 0:
         cprint(
             "This feature requires you to add at least one mortgage.\n"
             "Add a mortgage to proceed.",
@@ -668,8 +621,9 @@ def amortization():
         )
     else:
         cprint("You have entered the following mortgages:\n", "light_green")
-        for x in mortgage_dict:
-            print(f"Mortgage: # {x}, {mortgage_dict[x].mortgage_name}")
+        for mortgage in mortgages:
+            print(f"Mortgage: # {mortgage.mortgage_ID}, "
+                  f"{mortgage.mortgage_name}")
 
         print("\n")
         while True:
@@ -685,47 +639,47 @@ def amortization():
                     menu_screen()
                     break
                 else:
-                    for x in mortgage_dict:
-                        if selection == x:
-                            cprint(f"\n\nAMORTIZATION SCHEDULE FOR:",
-                                   "light_yellow")
-                            schedule = mortgage_dict[
-                                x
-                            ].calculate_amortization_schedule()
-                            display_mortgage_details(mortgage_dict[x])
-                            print(
-                                tabulate(
-                                    schedule,
-                                    headers="firstrow",
-                                    tablefmt="github"
-                                )
-                            )
-                            print("\n")
-                            is_valid = True
-                        else:
-                            continue
+                    mortgage = mortgages.get(selection)
+                    if mortgage is not None:
+                        cprint(f"\n\nAMORTIZATION SCHEDULE FOR:",
+                               "light_yellow")
+                        schedule = mortgage.iter_amortization_schedule()
+                        display_mortgage_details(mortgage)
+                        print_paged_schedule(AMORTIZATION_HEADERS, schedule)
+                        print("\n")
             except ValueError:
                 print("Please enter a correct number")
 
     print("\n*******************************************************\n")
 
 
+@timed("menu.print_mortgage_avg")
 def print_mortgage_avg():
     """
-    Prints averages of data stored in Google Sheets in a table
-    """
-    mortgage_data = []
-    mortgage_worksheet = SHEET.worksheet("mortgage_data").get_all_values()
-    for row in mortgage_worksheet:
-        mortgage_data.append(row)
-
-    # Gets the calculations for the averages of Lifetime Interest,
-    # Monthly payments, Loan length, APR, and Principal amounts
-    interest_average = calculate_average(mortgage_data)
-    monthly_payment_average = calculate_average(mortgage_data)
-    loan_length_average = calculate_average(mortgage_data)
-    apr_average = calculate_average(mortgage_data)
-    principal_average = calculate_average(mortgage_data)
+    Prints averages of the stored mortgage data in a table
+    """
+    # Gets the averages of Principal amounts, APR, Loan length,
+    # Monthly payments, and Lifetime Interest
+    try:
+        metrics = mortgage_store.metrics()
+    except TIMEOUT_ERRORS:
+        cprint("The mortgage data took too long to load. "
+               "Please try again.", "light_red")
+        return
+    except KeyboardInterrupt:
+        # Cancels loading the data and returns to the main menu
+        cprint("\nCancelled.", "light_red")
+        return
+    except retry_errors() + (sqlite3.Error,) as error:
+        # Google Sheets or the local cache failed, e.g. without creds.json
+        # or network access
+        cprint(f"Could not load the mortgage data: {error}", "light_red")
+        return
+    principal_average = metrics["principal"].mean
+    apr_average = metrics["apr"].mean
+    loan_length_average = metrics["length_of_mortgage"].mean
+    monthly_payment_average = metrics["monthly_payment"].mean
+    interest_average = metrics["lifetime_interest"].mean
 
     # Prints the averages
     print_data_analysis_intro()
@@ -755,6 +709,9 @@ def main_menu():
       Mortgage Comparison Tool
     """
     while True:
+        # Loads the mortgage data in the background while the user chooses
+        # an option, so that the Mortgage Metrics open straight away
+        mortgage_store.prefetch_metrics()
         try:
             selection = int(input("Enter a selection from the Main Menu: \n"))
             if selection == 1:
@@ -802,6 +759,23 @@ def main_menu():
 
 def main():
     """Main function"""
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import batch
+        batch.main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "api":
+        import api
+        api.main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        import export
+        export.main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "schedules":
+        import schedule_store
+        schedule_store.main(sys.argv[2:])
+        return
+    init(strip=not sys.stdout.isatty())  # strip colors if stdout is redirected
     welcome_screen()
     menu_screen()
     main_menu()
@@ -0,0 +1,269 @@
+"""
+Overpayment scenario engine.
+
+Evaluates a whole grid of extra monthly principal amounts, lump payments,
+lump payment timings and APR changes for one mortgage in a single
+vectorized pass using the closed-form early payoff calculations, and
+ranks the scenarios at each APR by interest saved against the cash paid
+in. Rate shocks are evaluated for every loan of a Portfolio at once on
+the schedules in cents of the money engine.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import calculations
+import money
+
+Scenarios = namedtuple(
+    "Scenarios",
+    [
+        "extra_monthly_principal",
+        "lump_payment",
+        "lump_month",
+        "apr",
+        "payoff_month",
+        "interest_saved",
+        "cash_outlay",
+        "saved_per_euro",
+    ],
+)
+
+RateShocks = namedtuple(
+    "RateShocks",
+    [
+        "apr_change",
+        "apr",
+        "balance",
+        "monthly_payment",
+        "payment_change",
+        "payoff_month",
+        "interest_paid",
+        "interest_change",
+    ],
+)
+
+SCENARIO_HEADERS = [
+    "Extra\nMonthly",
+    "Lump",
+    "Lump\nMonth",
+    "APR %",
+    "Paid off\n(months)",
+    "Interest\nSaved",
+    "Cash\nOutlay",
+    "Saved\nper €",
+]
+
+
+def sweep_overpayment_scenarios(mortgage, extra_amounts=(0,),
+                                lump_payments=(0,), lump_months=(0,),
+                                apr_changes=(0,)):
+    """
+    Evaluates every combination of extra monthly principal, lump payment,
+    month the lump payment is made and change to the APR for a mortgage.
+
+    An APR change applies from the start and the monthly payment is
+    re-amortized over the same term, so interest saved is measured
+    against the same rate without any overpayments. Changes that would
+    take the APR to 0 or below, or to 100 or above, are left out.
+    """
+    apr_changes = np.asarray(apr_changes, dtype=np.float64)
+    apr_changes = apr_changes[(mortgage.apr + apr_changes > 0)
+                              & (mortgage.apr + apr_changes < 100)]
+    extra, lump, lump_month, apr_change = (
+        grid.ravel() for grid in np.meshgrid(
+            np.asarray(extra_amounts, dtype=np.float64),
+            np.asarray(lump_payments, dtype=np.float64),
+            np.asarray(lump_months, dtype=np.int64),
+            apr_changes,
+            indexing="ij",
+        )
+    )
+    principal = float(mortgage.principal)
+    total_payments = mortgage.length_of_mortgage * 12
+    apr = mortgage.apr + apr_change
+    rate = calculations.monthly_rate(apr)
+    monthly_payment = np.round(
+        rate * principal / (1 - np.power(1 + rate, -total_payments)), 2
+    )
+    payment = monthly_payment + extra
+    lump_month = np.minimum(lump_month, total_payments)
+
+    # Loans paid off by the extra monthly principal before the lump
+    # payment is due never make the lump payment
+    months_without_lump = calculations.payoff_months(principal, apr, payment)
+    paid_before_lump = months_without_lump <= lump_month
+    balance_at_lump = np.maximum(
+        calculations.balance_after(principal, rate, payment, lump_month), 0.0
+    )
+    lump_paid = np.where(paid_before_lump, 0.0,
+                         np.minimum(lump, balance_at_lump))
+    balance_after_lump = balance_at_lump - lump_paid
+
+    # The final payment of the term absorbs any rounding of the payment
+    months_after_lump = np.minimum(
+        np.ceil(calculations.payoff_months(balance_after_lump, apr, payment)
+                - 1e-9),
+        total_payments - lump_month,
+    ).astype(np.int64)
+    early_month = np.minimum(np.ceil(months_without_lump - 1e-9),
+                             total_payments).astype(np.int64)
+    payoff_month = np.where(paid_before_lump, early_month,
+                            lump_month + months_after_lump)
+    interest_paid = np.where(
+        paid_before_lump,
+        calculations.interest_until_payoff(principal, apr, payment,
+                                           early_month),
+        lump_month * payment - (principal - balance_at_lump)
+        + calculations.interest_until_payoff(balance_after_lump, apr,
+                                             payment, months_after_lump),
+    )
+    original_interest = calculations.interest_until_payoff(
+        principal, apr, monthly_payment, total_payments
+    )
+    # Adding 0.0 turns any -0.0 left by rounding into 0.0
+    interest_saved = np.round(original_interest - interest_paid, 2) + 0.0
+    cash_outlay = np.round(extra * payoff_month + lump_paid, 2) + 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saved_per_euro = np.where(cash_outlay > 0,
+                                  interest_saved / cash_outlay, 0.0)
+    return Scenarios(extra, lump_paid, lump_month, apr, payoff_month,
+                     interest_saved, cash_outlay, saved_per_euro)
+
+
+def sweep_rate_shocks(portfolio, apr_changes=(0,), shock_month=1):
+    """
+    Evaluates every change to the APR for every loan in a Portfolio on
+    the schedules in cents. The new APR is charged from shock_month, which
+    can be one month or a month for each loan, and the balance left then
+    is re-amortized over the rest of the term, as with
+    Mortgage.rate_changes. Extra monthly principal is paid before and
+    after the change.
+
+    Each result has a row for every APR change and a column for every
+    loan. interest_change is measured against the loan without the
+    change, so with extra monthly principal an APR change of 0 still
+    lowers the payment re-amortized over the rest of the term. Loans
+    paid off before shock_month keep their payment and interest.
+    """
+    apr_change = np.asarray(apr_changes, dtype=np.float64)[:, np.newaxis]
+    new_apr = portfolio.apr + apr_change
+    if np.any(new_apr <= 0) or np.any(new_apr >= 100):
+        raise ValueError("apr must be greater than 0 but less than 100")
+    shock_month = np.asarray(shock_month, dtype=np.int64)
+    if np.any(shock_month < 1):
+        raise ValueError("shock_month must be 1 or later")
+
+    principal, apr, length_of_mortgage, monthly_payment, extra = (
+        portfolio.cents_terms())
+    rounding = portfolio.rounding
+    total_payments = length_of_mortgage * 12
+    months_before = np.broadcast_to(
+        np.minimum(shock_month - 1, total_payments), principal.shape)
+    early_month, original_interest = money.portfolio_cents_totals(
+        principal, apr, length_of_mortgage, monthly_payment, extra, rounding
+    )
+    # The months before the change are the same for every APR change
+    balance = principal.copy()
+    interest_before = np.zeros(len(principal), dtype=np.int64)
+    for index, rows in money.iter_portfolio_months(
+            principal, apr, length_of_mortgage, monthly_payment, extra,
+            rounding, last_month=months_before):
+        balance[index] = rows.balance
+        interest_before[index] += rows.interest
+    shocked = (balance > 0) & (months_before < total_payments)
+    balance[~shocked] = 0
+
+    # The months after the change of every shocked loan at every APR
+    # change are calculated together, one row of loans after another
+    loans = np.flatnonzero(shocked)
+    changes = len(apr_change)
+    start, length, extra_after, interest = (
+        np.tile(values[loans], changes) for values in (
+            months_before, length_of_mortgage, extra, interest_before)
+    )
+    after = np.tile(balance[loans], changes)
+    scaled_apr = money.portfolio_to_scaled_apr(new_apr[:, loans]).ravel()
+    payment = money.portfolio_payment_cents(after, scaled_apr,
+                                            length * 12 - start, rounding)
+    months = start.copy()
+    for index, rows in money.iter_portfolio_months(
+            after, scaled_apr, length, payment, extra_after, rounding,
+            first_month=start + 1):
+        months[index] = rows.month
+        interest[index] += rows.interest
+
+    shape = new_apr.shape
+    new_payment = np.broadcast_to(monthly_payment, shape).copy()
+    new_payment[:, loans] = payment.reshape(changes, -1)
+    payoff_month = np.broadcast_to(early_month, shape).copy()
+    payoff_month[:, loans] = months.reshape(changes, -1)
+    interest_paid = np.broadcast_to(original_interest, shape).copy()
+    interest_paid[:, loans] = interest.reshape(changes, -1)
+    return RateShocks(
+        np.broadcast_to(apr_change, shape),
+        new_apr,
+        np.broadcast_to(balance / 100, shape),
+        new_payment / 100,
+        (new_payment - monthly_payment) / 100,
+        payoff_month,
+        interest_paid / 100,
+        (interest_paid - original_interest) / 100,
+    )
+
+
+def rank_scenarios(scenarios, top=None, apr=None):
+    """
+    Returns the indices of the scenarios at one APR that have a cash
+    outlay, ordered from the most interest saved per euro paid in to the
+    least. Interest saved is measured against the loan at each APR, so
+    scenarios at different APRs are never ranked against each other and
+    apr must be given when the scenarios have more than one.
+    """
+    if apr is None:
+        aprs = np.unique(scenarios.apr)
+        if len(aprs) > 1:
+            raise ValueError("the scenarios have more than one APR, "
+                             "choose the APR to rank")
+        apr = aprs[0] if len(aprs) else 0.0
+    candidates = np.flatnonzero((scenarios.cash_outlay > 0)
+                                & np.isclose(scenarios.apr, apr))
+    order = np.lexsort((-scenarios.interest_saved[candidates],
+                        -scenarios.saved_per_euro[candidates]))
+    return candidates[order][:top]
+
+
+def best_scenario_by_apr(scenarios):
+    """
+    Returns the index of the best ranked scenario at every APR of the
+    scenarios, from the lowest APR to the highest
+    """
+    best = []
+    for apr in np.unique(scenarios.apr):
+        ranked = rank_scenarios(scenarios, top=1, apr=apr)
+        best.extend(ranked.tolist())
+    return np.array(best, dtype=np.int64)
+
+
+def format_whole_euro(value):
+    """Formats a number as a whole euro amount so the table fits 80 columns"""
+    return "€{:,.0f}".format(value)
+
+
+def get_scenario_table(scenarios, indices):
+    """Creates table rows for the given scenarios"""
+    rows = []
+    for index in indices:
+        rows.append(
+            [
+                format_whole_euro(scenarios.extra_monthly_principal[index]),
+                format_whole_euro(scenarios.lump_payment[index]),
+                int(scenarios.lump_month[index]),
+                round(float(scenarios.apr[index]), 2),
+                int(scenarios.payoff_month[index]),
+                format_whole_euro(scenarios.interest_saved[index]),
+                format_whole_euro(scenarios.cash_outlay[index]),
+                round(float(scenarios.saved_per_euro[index]), 2),
+            ]
+        )
+    return rows
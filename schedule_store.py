@@ -0,0 +1,284 @@
+"""
+Memory-mapped store of amortization schedules.
+
+Every loan gets a fixed-size slot of max_months rows in a binary file,
+so the row for a loan ID and month is found by arithmetic and read
+straight from the memory map with no parsing or recalculating. A store
+is a directory of three files:
+
+    store.json  the number of loans and slots and max_months
+    loans.dat   loan ID, number of months and loan terms of every slot
+    rows.dat    payment, principal, extra, interest and balance of every
+                month of every slot, with zeros after the loan is paid off
+
+Updating a store from a Portfolio appends new loans and recalculates
+only the loans whose terms have changed.
+
+Usage:
+    python run.py schedules build in.csv --store schedules
+    python run.py schedules lookup schedules LOAN_ID MONTH
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+import calculations
+import money
+from batch import open_file
+from export import read_portfolio
+
+# 40 years of monthly payments
+MAX_MONTHS = 480
+ROW_COLUMNS = calculations.Schedule._fields[1:]
+LOAN_TYPE = np.dtype([
+    ("loan_id", np.int64),
+    ("months", np.int64),
+    ("principal", np.float64),
+    ("apr", np.float64),
+    ("length_of_mortgage", np.int64),
+    ("extra_monthly_principal", np.float64),
+])
+# Loan terms that change the schedule of a loan
+LOAN_TERMS = ("principal", "apr", "length_of_mortgage",
+              "extra_monthly_principal")
+INITIAL_SLOTS = 1024
+
+
+class ScheduleStore:
+    """
+    Fixed-stride schedule store, opened with mmap. Lookups can run on
+    any number of threads, also while an update is made one at a time.
+    The memory maps are swapped in together when the files grow, and a
+    loan is only found once its schedule has been written. A loan that
+    is being recalculated can be read part way through its rewrite.
+    """
+
+    def __init__(self, path, max_months=MAX_MONTHS):
+        self.path = path
+        self._lock = threading.Lock()
+        # The loans and rows memory maps, replaced in one assignment
+        self._maps = None
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(self._file("store.json")):
+            with open(self._file("store.json"), encoding="utf-8") as file:
+                state = json.load(file)
+            self.max_months = state["max_months"]
+            self.count = state["count"]
+            self._map(state["capacity"])
+        else:
+            self.max_months = max_months
+            self.count = 0
+            self._map(INITIAL_SLOTS)
+            self._save_state()
+        self._slots = {
+            loan_id: slot for slot, loan_id in
+            enumerate(self._maps[0]["loan_id"][:self.count].tolist())
+        }
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self, capacity):
+        """Memory-maps the files for capacity slots, growing them if needed"""
+        self.flush()
+        shapes = (
+            ("loans.dat", LOAN_TYPE, (capacity,)),
+            ("rows.dat", np.float64,
+             (capacity, self.max_months, len(ROW_COLUMNS))),
+        )
+        maps = []
+        for name, dtype, shape in shapes:
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(self._file(name), "ab") as file:
+                if file.tell() < size:
+                    file.truncate(size)
+            maps.append(np.memmap(self._file(name), dtype=dtype, mode="r+",
+                                  shape=shape))
+        # Lookups still using the old, smaller maps read the same data
+        self._maps = tuple(maps)
+        self.capacity = capacity
+
+    def _save_state(self):
+        with open(self._file("store.json"), "w", encoding="utf-8") as file:
+            json.dump({"max_months": self.max_months, "count": self.count,
+                       "capacity": self.capacity}, file)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, loan_id):
+        return loan_id in self._slots
+
+    def _slot(self, loans, loan_id, month):
+        slot = self._slots.get(loan_id)
+        if slot is None:
+            raise KeyError(f"loan {loan_id} is not in the schedule store")
+        if not 1 <= month <= loans["length_of_mortgage"][slot] * 12:
+            raise IndexError(f"month {month} is outside the term of loan "
+                             f"{loan_id}")
+        return slot
+
+    def lookup(self, loan_id, month):
+        """Returns the Schedule row of a loan in a month"""
+        loans, rows = self._maps
+        slot = self._slot(loans, loan_id, month)
+        return calculations.Schedule(
+            month, *rows[slot, month - 1].tolist()
+        )
+
+    def balance(self, loan_id, month):
+        """Returns the balance of a loan after the payment of a month"""
+        loans, rows = self._maps
+        slot = self._slot(loans, loan_id, month)
+        return float(rows[slot, month - 1, -1])
+
+    def schedule(self, loan_id):
+        """
+        Returns the schedule of a loan up to when it is paid off, as a
+        Schedule of read-only views of the memory map
+        """
+        loans, rows = self._maps
+        slot = self._slots[loan_id]
+        months = int(loans["months"][slot])
+        rows = rows[slot, :months]
+        rows = rows.view(np.ndarray)
+        rows.flags.writeable = False
+        return calculations.Schedule(np.arange(1, months + 1),
+                                     *(rows[:, column] for column in
+                                       range(len(ROW_COLUMNS))))
+
+    def update(self, portfolio):
+        """
+        Adds the loans of a Portfolio that are not in the store and
+        recalculates the ones whose terms have changed. Returns the number
+        of loans added and the number recalculated.
+        """
+        longest = portfolio.length_of_mortgage.max(initial=0) * 12
+        if longest > self.max_months:
+            raise ValueError(f"loans longer than {self.max_months} months "
+                             "do not fit in this schedule store")
+        loan_IDs = portfolio.mortgage_ID.tolist()
+        if len(set(loan_IDs)) != len(loan_IDs):
+            raise ValueError("the loan IDs of a portfolio must be unique")
+        with self._lock:
+            slots = np.array([self._slots.get(loan_ID, -1)
+                              for loan_ID in loan_IDs], dtype=np.int64)
+            new = slots < 0
+            # Numbers the new loans' slots after the existing ones
+            added = int(new.sum())
+            slots[new] = np.arange(self.count, self.count + added)
+            if self.count + added > self.capacity:
+                self._map(max(self.capacity * 2, self.count + added))
+            changed = new.copy()
+            existing = self._maps[0][slots[~new]]
+            changed[~new] = np.logical_or.reduce([
+                existing[term] != getattr(portfolio, term)[~new]
+                for term in LOAN_TERMS
+            ])
+            self._write(portfolio, np.flatnonzero(changed), slots[changed])
+            for loan_ID, slot in zip(np.asarray(loan_IDs)[new].tolist(),
+                                     slots[new].tolist()):
+                self._slots[loan_ID] = slot
+            self.count += added
+            self.flush()
+            self._save_state()
+            return added, int(changed.sum()) - added
+
+    def _write(self, portfolio, indices, slots, chunk_loans=1000):
+        """Calculates and writes the schedules of loans into their slots"""
+        loans_map, rows_map = self._maps
+        terms = portfolio.cents_terms()
+        for start in range(0, len(indices), chunk_loans):
+            index = indices[start:start + chunk_loans]
+            slot = slots[start:start + chunk_loans]
+            loan, schedule = money.portfolio_cents_schedules(
+                *(term[index] for term in terms), portfolio.rounding
+            )
+            # Each loan's slot is written in one assignment, with zeros
+            # after the loan is paid off
+            rows = np.zeros((len(index), self.max_months, len(ROW_COLUMNS)))
+            rows[loan, schedule.month - 1] = np.column_stack(
+                schedule[1:]) / 100
+            rows_map[slot] = rows
+            loans = loans_map[slot]
+            loans["loan_id"] = portfolio.mortgage_ID[index]
+            loans["months"] = np.bincount(loan, minlength=len(index))
+            for term in LOAN_TERMS:
+                loans[term] = getattr(portfolio, term)[index]
+            loans_map[slot] = loans
+
+    def flush(self):
+        """Writes changes in the memory maps to disk"""
+        for mapped in self._maps or ():
+            mapped.flush()
+
+    def close(self):
+        self.flush()
+        self._maps = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="run.py schedules",
+        description="Build and query a memory-mapped schedule store.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser(
+        "build", help="add or update the mortgages of a CSV or JSONL file"
+    )
+    build.add_argument("input", help="CSV or JSONL file of mortgages, "
+                       "or - to read from standard input")
+    build.add_argument("--store", required=True,
+                       help="directory of the schedule store")
+    build.add_argument("--input-format", choices=("csv", "jsonl"),
+                       help="input format (default: from the file name)")
+    lookup = commands.add_parser("lookup",
+                                 help="print a loan's row for a month")
+    lookup.add_argument("store", help="directory of the schedule store")
+    lookup.add_argument("loan_id", type=int)
+    lookup.add_argument("month", type=int)
+    args = parser.parse_args(argv)
+    if args.command == "build" and args.input_format is None:
+        args.input_format = "jsonl" if args.input.endswith(
+            (".jsonl", ".json")) else "csv"
+    return args
+
+
+def main(argv=None):
+    """Runs the schedule store command line"""
+    args = parse_args(argv)
+    if args.command == "build":
+        input_file = open_file(args.input, "r")
+        try:
+            portfolio = read_portfolio(input_file, args.input_format)
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+        with ScheduleStore(args.store) as store:
+            try:
+                added, rebuilt = store.update(portfolio)
+            except ValueError as error:
+                sys.exit(str(error))
+        print(f"Added {added} and recalculated {rebuilt} of "
+              f"{len(portfolio)} mortgage(s).", file=sys.stderr)
+    else:
+        with ScheduleStore(args.store) as store:
+            try:
+                row = store.lookup(args.loan_id, args.month)
+            except (KeyError, IndexError) as error:
+                sys.exit(error.args[0])
+        print(json.dumps(row._asdict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Session server for the Mortgage Comparison Tool.
+
+Runs the menu of run.py for many users in one long-lived process, so
+that the interpreter, the imports and the Google Sheets connection are
+set up once rather than for every visitor. Each TCP connection gets its
+own pseudo-terminal and Session, and its menu runs on its own thread.
+
+Usage:
+    python3 server.py
+"""
+import fcntl
+import io
+import os
+import pty
+import select
+import socketserver
+import struct
+import sys
+import termios
+import threading
+
+import session
+
+HOST = "127.0.0.1"
+PORT = int(os.environ.get("SESSION_SERVER_PORT", 8765))
+# Size of the terminal shown in the browser
+COLUMNS = 80
+ROWS = 24
+READ_SIZE = 4096
+
+# input() and print() of every session go to that session's terminal
+session.install_session_streams()
+
+import run  # noqa: E402
+from mortgage import mortgage_store  # noqa: E402
+
+
+def warm_up():
+    """
+    Connects to the mortgage data storage and reads the stored mortgage
+    data ahead of the first session
+    """
+    try:
+        mortgage_store.metrics()
+    except Exception as error:
+        print(f"Could not connect to the mortgage data storage: {error}",
+              file=sys.__stderr__)
+
+
+class TerminalStream(io.TextIOWrapper):
+    """
+    Text stream of a session's pseudo-terminal. Reading or writing fails
+    once the user has disconnected, which is raised as EOFError so that
+    it is not mistaken for an error of the menus themselves.
+    """
+
+    def readline(self, size=-1):
+        try:
+            return super().readline(size)
+        except OSError as error:
+            raise EOFError("the terminal was closed") from error
+
+    def write(self, text):
+        try:
+            return super().write(text)
+        except OSError as error:
+            raise EOFError("the terminal was closed") from error
+
+    def flush(self):
+        try:
+            return super().flush()
+        except OSError as error:
+            raise EOFError("the terminal was closed") from error
+
+
+def run_session(user_session):
+    """Runs the menus of the Mortgage Comparison Tool for one session"""
+    with session.activate(user_session):
+        try:
+            run.welcome_screen()
+            run.menu_screen()
+            run.main_menu()
+        except EOFError:
+            # The user closed the connection
+            pass
+        finally:
+            for stream in (user_session.stdin, user_session.stdout):
+                try:
+                    stream.close()
+                except (EOFError, OSError):
+                    pass
+
+
+class SessionHandler(socketserver.BaseRequestHandler):
+    """Bridges one TCP connection to a new session on a pseudo-terminal"""
+
+    def handle(self):
+        master, slave = pty.openpty()
+        fcntl.ioctl(slave, termios.TIOCSWINSZ,
+                    struct.pack("HHHH", ROWS, COLUMNS, 0, 0))
+        user_session = session.Session(
+            TerminalStream(open(os.dup(slave), "rb"), encoding="utf-8",
+                           errors="replace"),
+            TerminalStream(open(slave, "wb"), encoding="utf-8",
+                           line_buffering=True),
+        )
+        session_thread = threading.Thread(target=run_session,
+                                          args=(user_session,), daemon=True)
+        session_thread.start()
+        try:
+            self.bridge(master)
+        except ConnectionError:
+            # The user's connection dropped
+            pass
+        finally:
+            # Closing the terminal ends a session that is waiting for input
+            os.close(master)
+            session_thread.join()
+
+    def bridge(self, master):
+        """
+        Copies what the user types to the terminal and what the session
+        prints back to the user until either side closes
+        """
+        connection = self.request
+        while True:
+            readable, _, _ = select.select([connection, master], [], [])
+            if connection in readable:
+                data = connection.recv(READ_SIZE)
+                if not data:
+                    return
+                os.write(master, data)
+            if master in readable:
+                try:
+                    data = os.read(master, READ_SIZE)
+                except OSError:
+                    # The session ended and closed its terminal
+                    return
+                if not data:
+                    return
+                connection.sendall(data)
+
+
+class SessionServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def main():
+    threading.Thread(target=warm_up, daemon=True).start()
+    with SessionServer((HOST, PORT), SessionHandler) as server:
+        print(f"Session server listening on {HOST}:{PORT}",
+              file=sys.__stderr__)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
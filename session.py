@@ -0,0 +1,95 @@
+"""
+Sessions of the Mortgage Comparison Tool.
+
+A Session holds the state of one user: the mortgages they saved and the
+terminal they are using. Running run.py directly uses a single default
+session on the process's own terminal. The session server runs many
+sessions in one process, one per thread, and installs SessionStreams as
+sys.stdin and sys.stdout so that input() and print() use the terminal of
+the session running on the current thread.
+"""
+import contextlib
+import io
+import sys
+import threading
+
+from registry import MortgageRegistry
+
+
+class Session:
+    """State and terminal of one user's session"""
+
+    def __init__(self, stdin=None, stdout=None):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.mortgages = MortgageRegistry()
+
+
+_local = threading.local()
+_default_session = Session()
+
+
+def current_session():
+    """Returns the session running on the current thread"""
+    return getattr(_local, "session", _default_session)
+
+
+@contextlib.contextmanager
+def activate(session):
+    """Makes session the current session of this thread"""
+    previous = getattr(_local, "session", None)
+    _local.session = session
+    try:
+        yield session
+    finally:
+        _local.session = previous
+
+
+class SessionStream(io.TextIOBase):
+    """
+    Text stream that passes every call on to the stdin or stdout of the
+    current session, falling back to the process's own stream
+    """
+
+    def __init__(self, name, fallback):
+        self._name = name
+        self._fallback = fallback
+
+    def _stream(self):
+        return getattr(current_session(), self._name) or self._fallback
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        return self._stream().flush()
+
+    def readline(self, size=-1):
+        return self._stream().readline(size)
+
+    def read(self, size=-1):
+        return self._stream().read(size)
+
+    def isatty(self):
+        return self._stream().isatty()
+
+    def fileno(self):
+        # Not a real file, so input() reads with readline() instead of
+        # using the process's own terminal
+        raise io.UnsupportedOperation("fileno")
+
+    @property
+    def encoding(self):
+        return self._stream().encoding
+
+    def readable(self):
+        return self._name == "stdin"
+
+    def writable(self):
+        return self._name == "stdout"
+
+
+def install_session_streams():
+    """Sends sys.stdin and sys.stdout to the current session's terminal"""
+    sys.stdin = SessionStream("stdin", sys.stdin)
+    sys.stdout = SessionStream("stdout", sys.stdout)
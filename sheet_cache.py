@@ -0,0 +1,147 @@
+"""
+Local SQLite copy of a Google Sheets worksheet.
+
+The worksheet is downloaded once and after that only rows appended since
+the last sync are fetched, using the number of worksheet rows already
+seen as a high-water mark. Blank rows are counted in the high-water mark
+but not cached. The worksheet is expected to be append-only.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import io_loop
+from instrumentation import span
+from sheets import get_worksheet
+
+CACHE_PATH = os.environ.get("MORTGAGE_CACHE_PATH", "sheet_cache.sqlite3")
+CACHE_MAX_AGE = float(os.environ.get("MORTGAGE_CACHE_MAX_AGE", "60"))
+
+
+class WorksheetCache:
+    """
+    On-disk cache of a worksheet's values that syncs newly appended rows
+    when the cached copy is older than max_age seconds
+    """
+
+    def __init__(self, worksheet_name, path=CACHE_PATH,
+                 max_age=CACHE_MAX_AGE):
+        self.worksheet_name = worksheet_name
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _db(self):
+        """Opens the cache database the first time it is used"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path,
+                                               check_same_thread=False)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS worksheet_rows ("
+                    "worksheet TEXT NOT NULL, row_number INTEGER NOT NULL, "
+                    "row_values TEXT NOT NULL, "
+                    "PRIMARY KEY (worksheet, row_number))"
+                )
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sync_state ("
+                    "worksheet TEXT PRIMARY KEY, "
+                    "row_count INTEGER NOT NULL, synced_at REAL NOT NULL, "
+                    "sheet_row_count INTEGER)"
+                )
+                columns = [column[1] for column in self._connection.execute(
+                    "PRAGMA table_info(sync_state)")]
+                # Caches created before blank rows were counted
+                if "sheet_row_count" not in columns:
+                    self._connection.execute(
+                        "ALTER TABLE sync_state "
+                        "ADD COLUMN sheet_row_count INTEGER"
+                    )
+        return self._connection
+
+    def _state(self):
+        """
+        Returns the cached row count, the time of the last sync and the
+        number of worksheet rows seen, including blank ones
+        """
+        state = self._db().execute(
+            "SELECT row_count, synced_at, sheet_row_count FROM sync_state "
+            "WHERE worksheet = ?",
+            (self.worksheet_name,),
+        ).fetchone()
+        if not state:
+            return 0, 0.0, 0
+        row_count, synced_at, sheet_row_count = state
+        return (row_count, synced_at,
+                row_count if sheet_row_count is None else sheet_row_count)
+
+    @property
+    def row_count(self):
+        """
+        Number of worksheet rows, including the header, in the cache.
+        Blank worksheet rows are not cached or counted.
+        """
+        with self._lock:
+            return self._state()[0]
+
+    def is_stale(self):
+        """Returns whether the cache is past its staleness window"""
+        with self._lock:
+            return time.time() - self._state()[1] >= self.max_age
+
+    def sync(self, force=False):
+        """
+        Downloads the rows appended to the worksheet since the last sync
+        unless the cache is still within its staleness window. Returns the
+        number of new rows.
+        """
+        with self._lock:
+            row_count, synced_at, sheet_row_count = self._state()
+            if not force and time.time() - synced_at < self.max_age:
+                return 0
+            # Starts at the last worksheet row seen, which always exists,
+            # so the range never falls outside the worksheet grid
+            first_row = max(sheet_row_count, 1)
+            values = io_loop.run(self._fetch, f"A{first_row}:Z")
+            appended = values[sheet_row_count - first_row + 1:]
+            new_rows = [row for row in appended if row]
+            connection = self._db()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO worksheet_rows "
+                    "VALUES (?, ?, ?)",
+                    (
+                        (self.worksheet_name, row_count + number,
+                         json.dumps(row))
+                        for number, row in enumerate(new_rows, start=1)
+                    ),
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                    (self.worksheet_name, row_count + len(new_rows),
+                     time.time(), sheet_row_count + len(appended)),
+                )
+            return len(new_rows)
+
+    def _fetch(self, range_name):
+        worksheet = get_worksheet(self.worksheet_name)
+        with span("sheets.get_values"):
+            return worksheet.get_values(range_name)
+
+    def rows(self, after=0):
+        """
+        Yields the cached rows that come after the given row number, e.g.
+        after=1 skips the header row
+        """
+        with self._lock:
+            cursor = self._db().execute(
+                "SELECT row_values FROM worksheet_rows "
+                "WHERE worksheet = ? AND row_number > ? ORDER BY row_number",
+                (self.worksheet_name, after),
+            )
+            values = cursor.fetchall()
+        for (row_values,) in values:
+            yield json.loads(row_values)
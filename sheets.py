@@ -0,0 +1,187 @@
+"""
+Google Sheets connection for the Mortgage Comparison Tool.
+
+The connection is created the first time it is needed and shared after
+that, so menu options that never use Google Sheets do no network work.
+gspread and the Google auth libraries are imported at the same point,
+which keeps them out of the program's start up.
+"""
+import atexit
+import sys
+import threading
+import time
+
+import io_loop
+from instrumentation import span
+
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive",
+]
+CREDS_FILE = "creds.json"
+SPREADSHEET_NAME = "mortgage_calculator"
+
+_sheet = None
+_worksheets = {}
+_lock = threading.Lock()
+
+
+def retry_errors():
+    """Returns the errors that are worth retrying when writing to Sheets"""
+    import gspread
+    return (gspread.exceptions.APIError, OSError) + io_loop.TIMEOUT_ERRORS
+
+
+def get_sheet():
+    """
+    Authenticates with Google and opens the spreadsheet on first use,
+    then returns the same spreadsheet on every later call
+    """
+    global _sheet
+    if _sheet is None:
+        with _lock:
+            if _sheet is None:
+                with span("sheets.open"):
+                    import gspread
+                    from google.oauth2.service_account import Credentials
+                    creds = Credentials.from_service_account_file(
+                        CREDS_FILE
+                    )
+                    scoped_creds = creds.with_scopes(SCOPE)
+                    gspread_client = gspread.authorize(scoped_creds)
+                    _sheet = gspread_client.open(SPREADSHEET_NAME)
+    return _sheet
+
+
+def get_worksheet(name):
+    """Returns a worksheet of the spreadsheet, opening it only once"""
+    worksheet = _worksheets.get(name)
+    if worksheet is None:
+        sheet = get_sheet()
+        with span("sheets.worksheet"):
+            worksheet = sheet.worksheet(name)
+        with _lock:
+            worksheet = _worksheets.setdefault(name, worksheet)
+    return worksheet
+
+
+class SheetWriteBuffer:
+    """
+    Write-behind buffer for a worksheet - rows are collected in memory and
+    appended by a background thread with a single append_rows call when
+    the buffer is full, when the flush interval passes, or at exit
+    """
+
+    def __init__(self, worksheet_name, max_rows=50, flush_interval=5.0,
+                 max_retries=4, backoff=0.5):
+        self.worksheet_name = worksheet_name
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        atexit.register(self.close)
+
+    def append(self, row):
+        """Adds a row to the buffer without waiting on the network"""
+        with self._lock:
+            self._rows.append(list(row))
+            full = len(self._rows) >= self.max_rows
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sheet-writer", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        """Returns the number of rows waiting to be written"""
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self):
+        """
+        Appends all buffered rows to the worksheet on the I/O loop,
+        retrying with exponential backoff. Rows that still fail are kept
+        for the next flush.
+        """
+        return self._flush(
+            lambda rows: io_loop.run(self._append_rows, rows)
+        )
+
+    def _append_rows(self, rows):
+        worksheet = get_worksheet(self.worksheet_name)
+        with span("sheets.append_rows"):
+            worksheet.append_rows(rows)
+
+    def _flush(self, append_rows):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return True
+            written = False
+            try:
+                delay = self.backoff
+                for attempt in range(self.max_retries):
+                    try:
+                        append_rows(rows)
+                        written = True
+                        return True
+                    # Only evaluated once an append fails, by which point
+                    # gspread is imported
+                    except retry_errors():
+                        if attempt == self.max_retries - 1:
+                            break
+                        time.sleep(delay)
+                        delay *= 2
+                return False
+            finally:
+                # Rows that were not written, whatever the error, are kept
+                # for the next flush
+                if not written:
+                    with self._lock:
+                        self._rows[:0] = rows
+
+    def close(self):
+        """Stops the background thread and writes any remaining rows"""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        # Written directly, because the I/O worker threads have stopped by
+        # the time the interpreter runs its exit functions
+        try:
+            flushed = self._flush(self._append_rows)
+        except Exception as error:
+            print(f"Could not write to the {self.worksheet_name} worksheet: "
+                  f"{type(error).__name__}: {error}", file=sys.stderr)
+            flushed = False
+        if not flushed:
+            print(
+                f"Could not save {self.pending()} row(s) to the "
+                f"{self.worksheet_name} worksheet.",
+                file=sys.stderr,
+            )
+
+    def _run(self):
+        """Background loop that flushes on the size threshold or timer"""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._closed:
+                try:
+                    self.flush()
+                except Exception as error:
+                    # The rows are kept, so the loop goes on and tries
+                    # again on the next timer
+                    print(f"Could not write to the {self.worksheet_name} "
+                          f"worksheet: {type(error).__name__}: {error}",
+                          file=sys.stderr)
@@ -0,0 +1,197 @@
+"""
+Storage backends for the mortgage data collected by the tool.
+
+The backend is chosen with the MORTGAGE_STORAGE environment variable:
+"sheets" (the default) stores data in Google Sheets and "sqlite" stores
+it in a local SQLite database at MORTGAGE_DB_PATH.
+"""
+import os
+import sqlite3
+import threading
+
+import io_loop
+from metrics import MORTGAGE_DATA_COLUMNS, ColumnStats, MortgageMetrics
+from sheet_cache import WorksheetCache
+from sheets import SheetWriteBuffer
+
+STORAGE_BACKEND = os.environ.get("MORTGAGE_STORAGE", "sheets")
+DB_PATH = os.environ.get("MORTGAGE_DB_PATH", "mortgage_data.sqlite3")
+
+
+class MortgageStore:
+    """
+    Base Class for mortgage data storage - rows are lists of principal,
+    APR, loan length, monthly payment and lifetime interest
+    """
+
+    def append(self, row):
+        """Stores the data row of one mortgage"""
+        self.append_rows([row])
+
+    def append_rows(self, rows):
+        """Stores the data rows of many mortgages"""
+        raise NotImplementedError
+
+    def metrics(self):
+        """Returns MortgageMetrics for all of the stored mortgages"""
+        raise NotImplementedError
+
+    def prefetch_metrics(self):
+        """
+        Starts reading the stored mortgages in the background, so that a
+        later metrics() call returns quickly
+        """
+
+    def flush(self):
+        """Writes any buffered rows"""
+
+    def close(self):
+        """Writes any buffered rows and releases the storage"""
+        self.flush()
+
+
+class SheetsStore(MortgageStore):
+    """
+    Stores mortgage data in a Google Sheets worksheet through a write
+    buffer, and reads it back from a local cache of the worksheet
+    """
+
+    def __init__(self, worksheet_name="mortgage_data"):
+        self.writer = SheetWriteBuffer(worksheet_name)
+        self.cache = WorksheetCache(worksheet_name)
+        self._metrics = MortgageMetrics()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = None
+
+    def append_rows(self, rows):
+        for row in rows:
+            self.writer.append(row)
+
+    def _refresh(self):
+        """Writes the buffered rows and syncs the cached worksheet"""
+        # Writes any mortgages still waiting in the buffer so they are
+        # included
+        wrote_rows = self.writer.pending() > 0
+        self.writer.flush()
+        # Downloads only the rows appended since the last sync
+        self.cache.sync(force=wrote_rows)
+
+    def prefetch_metrics(self):
+        """
+        Starts a sync of the cached worksheet on the I/O loop when the
+        cache is past its staleness window and no sync is running, and
+        returns the Future of the sync, if any. Buffered rows are left to
+        the write buffer, so they are still written in batches.
+        """
+        with self._refresh_lock:
+            if ((self._refreshing is None or self._refreshing.done())
+                    and self.cache.is_stale()):
+                self._refreshing = io_loop.submit(self.cache.sync)
+            return self._refreshing
+
+    def metrics(self):
+        # Waits for a prefetch that is still running instead of syncing
+        # next to it. A failed prefetch is left to the refresh below.
+        with self._refresh_lock:
+            refreshing = self._refreshing
+        if refreshing is not None and not refreshing.done():
+            try:
+                io_loop.wait(refreshing)
+            except Exception:
+                pass
+        self._refresh()
+        with self._lock:
+            # Skips the header row and the rows that are already read,
+            # whether they were aggregated or skipped as malformed
+            self._metrics.update(
+                self.cache.rows(after=1 + self._metrics.rows_read)
+            )
+            return self._metrics
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+class SQLiteStore(MortgageStore):
+    """
+    Stores mortgage data in a local SQLite database with bulk inserts and
+    indexed aggregate queries
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS mortgage_data ("
+                "id INTEGER PRIMARY KEY, principal REAL NOT NULL, "
+                "apr REAL NOT NULL, length_of_mortgage INTEGER NOT NULL, "
+                "monthly_payment REAL NOT NULL, "
+                "lifetime_interest REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS mortgage_data_length_apr "
+                "ON mortgage_data (length_of_mortgage, apr)"
+            )
+
+    def append_rows(self, rows):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO mortgage_data (principal, apr, "
+                "length_of_mortgage, monthly_payment, lifetime_interest) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def metrics(self, length_of_mortgage=None):
+        """
+        Returns MortgageMetrics for the stored mortgages, optionally only
+        for one loan length, using a single aggregate query
+        """
+        select = ", ".join(
+            f"SUM({column}), SUM({column} * {column}), "
+            f"MIN({column}), MAX({column})"
+            for column in MORTGAGE_DATA_COLUMNS
+        )
+        query = f"SELECT COUNT(*), {select} FROM mortgage_data"
+        parameters = ()
+        if length_of_mortgage is not None:
+            query += " WHERE length_of_mortgage = ?"
+            parameters = (length_of_mortgage,)
+        with self._lock:
+            count, *aggregates = self._connection.execute(
+                query, parameters
+            ).fetchone()
+        metrics = MortgageMetrics()
+        for index, column in enumerate(MORTGAGE_DATA_COLUMNS):
+            metrics.columns[column] = ColumnStats.from_aggregates(
+                count, *aggregates[index * 4:index * 4 + 4]
+            )
+        return metrics
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+STORAGE_BACKENDS = {
+    "sheets": SheetsStore,
+    "sqlite": SQLiteStore,
+}
+
+
+def get_store(backend=STORAGE_BACKEND):
+    """Creates the storage backend chosen by configuration"""
+    try:
+        return STORAGE_BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown storage backend {backend!r}. Choose one of: "
+            + ", ".join(STORAGE_BACKENDS)
+        ) from None
@@ -0,0 +1,225 @@
+"""
+Tests for the cent-exact money engine and the rate shocks calculated
+on it.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import money  # noqa: E402
+import scenarios  # noqa: E402
+from mortgage import Mortgage  # noqa: E402
+from portfolio import Portfolio  # noqa: E402
+
+# Loans whose payment in floating point is within the tolerance of a
+# rounding boundary, so floating point cannot decide which way it rounds
+HALF_CENT_LOANS = [
+    (23004399, 37354, 7),
+    (15441298, 48365, 33),
+    (36608580, 108033, 38),
+    (27569779, 88871, 19),
+]
+WHOLE_CENT_LOANS = [
+    (7866308, 144826, 19),
+    (44590188, 115231, 26),
+    (45782409, 58242, 34),
+    (27229731, 93280, 34),
+]
+
+
+def random_loans(size, seed=0):
+    """Returns the terms in cents of random loans, some with extra principal"""
+    generator = np.random.default_rng(seed)
+    principal = generator.integers(1, 100_000_000, size)
+    apr = generator.integers(1, 150_000, size)
+    length_of_mortgage = generator.integers(1, 41, size)
+    extra = generator.choice([0, 0, 1, 10_000, 50_000], size)
+    return principal, apr, length_of_mortgage, extra
+
+
+def payments(principal, apr, length_of_mortgage, rounding):
+    return money.portfolio_monthly_payment_cents(principal, apr,
+                                                 length_of_mortgage, rounding)
+
+
+@pytest.mark.parametrize("rounding", money.ROUNDING_MODES)
+def test_portfolio_schedules_match_single_schedules(rounding):
+    principal, apr, length_of_mortgage, extra = random_loans(200)
+    payment = payments(principal, apr, length_of_mortgage, rounding)
+    loan, rows = money.portfolio_cents_schedules(
+        principal, apr, length_of_mortgage, payment, extra, rounding
+    )
+    for index in range(len(principal)):
+        schedule = money.cents_schedule(
+            int(principal[index]), int(apr[index]),
+            int(length_of_mortgage[index]), int(payment[index]),
+            int(extra[index]), rounding,
+        )
+        for expected, column in zip(schedule, rows):
+            np.testing.assert_array_equal(column[loan == index], expected)
+
+
+@pytest.mark.parametrize("rounding", money.ROUNDING_MODES)
+def test_portfolio_totals_match_single_schedules(rounding):
+    principal, apr, length_of_mortgage, extra = random_loans(200, seed=1)
+    payment = payments(principal, apr, length_of_mortgage, rounding)
+    months, interest = money.portfolio_cents_totals(
+        principal, apr, length_of_mortgage, payment, extra, rounding
+    )
+    for index in range(len(principal)):
+        schedule = money.cents_schedule(
+            int(principal[index]), int(apr[index]),
+            int(length_of_mortgage[index]), int(payment[index]),
+            int(extra[index]), rounding,
+        )
+        assert months[index] == len(schedule.month)
+        assert interest[index] == schedule.interest.sum()
+        if not extra[index]:
+            assert interest[index] == money.schedule_interest_cents(
+                int(principal[index]), int(apr[index]),
+                int(length_of_mortgage[index]), rounding,
+            )
+
+
+@pytest.mark.parametrize("rounding", money.ROUNDING_MODES)
+def test_every_schedule_ends_at_zero(rounding):
+    principal, apr, length_of_mortgage, extra = random_loans(300, seed=2)
+    payment = payments(principal, apr, length_of_mortgage, rounding)
+    # Payments that are too small or too large are cleared as well
+    payment[::3] = payment[::3] // 2
+    payment[1::3] = payment[1::3] * 3
+    loan, rows = money.portfolio_cents_schedules(
+        principal, apr, length_of_mortgage, payment, extra, rounding
+    )
+    assert (rows.balance >= 0).all()
+    last = np.r_[loan[1:] != loan[:-1], True]
+    np.testing.assert_array_equal(loan[last], np.arange(len(principal)))
+    np.testing.assert_array_equal(rows.balance[last], 0)
+    # Paid and charged add up to the principal for every loan
+    paid = np.bincount(loan, rows.payment + rows.extra - rows.interest)
+    np.testing.assert_array_equal(paid, principal)
+    for index in range(0, len(principal), 7):
+        schedule = money.cents_schedule(
+            int(principal[index]), int(apr[index]),
+            int(length_of_mortgage[index]), int(payment[index]),
+            int(extra[index]), rounding,
+        )
+        assert schedule.balance[-1] == 0
+        assert schedule.month[-1] <= length_of_mortgage[index] * 12
+
+
+@pytest.mark.parametrize("numerator, half_up, half_even", [
+    (1, 1, 0),
+    (3, 2, 2),
+    (5, 3, 2),
+    (7, 4, 4),
+    (4, 2, 2),
+])
+def test_divide_breaks_ties_to_even(numerator, half_up, half_even):
+    assert money.divide(numerator, 2, money.ROUND_HALF_UP) == half_up
+    assert money.divide(numerator, 2, money.ROUND_HALF_EVEN) == half_even
+    assert money.divide(np.array([numerator]), 2,
+                        money.ROUND_HALF_EVEN)[0] == half_even
+
+
+@pytest.mark.parametrize("balance, half_up, half_even", [
+    (50, 1, 0),
+    (150, 2, 2),
+    (250, 3, 2),
+    (251, 3, 3),
+])
+def test_schedules_break_interest_ties_to_even(balance, half_up, half_even):
+    # At an APR of 12% a month's interest is 1% of the balance, so a
+    # balance of 50 cents owes exactly half a cent
+    apr = 12 * money.APR_SCALE
+    for rounding, expected in ((money.ROUND_HALF_UP, half_up),
+                               (money.ROUND_HALF_EVEN, half_even)):
+        schedule = money.cents_schedule(balance, apr, 1, 1, 0, rounding)
+        assert schedule.interest[0] == expected
+        _, rows = money.portfolio_cents_schedules([balance], apr, 1, 1, 0,
+                                                  rounding)
+        assert rows.interest[0] == expected
+
+
+@pytest.mark.parametrize("rounding, loans", [
+    (money.ROUND_HALF_UP, HALF_CENT_LOANS),
+    (money.ROUND_HALF_EVEN, HALF_CENT_LOANS),
+    (money.ROUND_DOWN, WHOLE_CENT_LOANS),
+    (money.ROUND_UP, WHOLE_CENT_LOANS),
+])
+def test_payments_near_a_rounding_boundary_use_decimal(rounding, loans,
+                                                       monkeypatch):
+    principal, apr, length_of_mortgage = (np.array(terms)
+                                          for terms in zip(*loans))
+    expected = [money.decimal_payment_cents(int(p), int(a), int(n) * 12,
+                                            rounding)
+                for p, a, n in loans]
+    calls = []
+    decimal_payment_cents = money.decimal_payment_cents
+
+    def counted(*args):
+        calls.append(args)
+        return decimal_payment_cents(*args)
+
+    monkeypatch.setattr(money, "decimal_payment_cents", counted)
+    # An ordinary loan in between is calculated with floating point
+    principal = np.insert(principal, 1, 25_000_000)
+    apr = np.insert(apr, 1, 35_000)
+    length_of_mortgage = np.insert(length_of_mortgage, 1, 30)
+    cents = money.portfolio_monthly_payment_cents(
+        principal, apr, length_of_mortgage, rounding
+    )
+    assert len(calls) == len(loans)
+    assert np.delete(cents, 1).tolist() == expected
+    assert cents[1] == decimal_payment_cents(25_000_000, 35_000, 360,
+                                             rounding)
+    for (p, a, n), payment in zip(loans, expected):
+        assert money.payment_cents(p, a, n * 12, rounding) == payment
+
+
+@pytest.mark.parametrize("rounding", money.ROUNDING_MODES)
+def test_float_payments_match_decimal_payments(rounding):
+    principal, apr, length_of_mortgage, _ = random_loans(2000, seed=3)
+    cents = payments(principal, apr, length_of_mortgage, rounding)
+    for index in range(len(principal)):
+        assert cents[index] == money.decimal_payment_cents(
+            int(principal[index]), int(apr[index]),
+            int(length_of_mortgage[index]) * 12, rounding,
+        )
+
+
+@pytest.mark.parametrize("rounding", money.ROUNDING_MODES)
+def test_rate_shocks_match_rate_changes(rounding):
+    generator = np.random.default_rng(4)
+    principal = np.round(generator.uniform(1_000, 900_000, 40), 2)
+    apr = np.round(generator.uniform(0.5, 12, 40), 3)
+    length_of_mortgage = generator.integers(1, 41, 40)
+    extra = np.where(generator.random(40) < 0.4, 500.0, 0.0)
+    shock_month = generator.integers(2, 500, 40)
+    portfolio = Portfolio(principal, apr, length_of_mortgage, None, extra)
+    portfolio.rounding = rounding
+    apr_changes = [-0.5, 0, 2]
+    shocks = scenarios.sweep_rate_shocks(portfolio, apr_changes, shock_month)
+    for index in range(len(portfolio)):
+        terms = (float(principal[index]), float(apr[index]),
+                 int(length_of_mortgage[index]), "", float(extra[index]))
+        original = Mortgage(*terms, rounding=rounding).cents_schedule()
+        for row, apr_change in enumerate(apr_changes):
+            mortgage = Mortgage(*terms, rounding=rounding)
+            mortgage.rate_changes = {
+                int(shock_month[index]): float(apr[index]) + apr_change
+            }
+            schedule = mortgage.cents_schedule()
+            assert shocks.payoff_month[row, index] == schedule.month[-1]
+            assert shocks.interest_paid[row, index] == (
+                schedule.interest.sum() / 100)
+            assert shocks.interest_change[row, index] == (
+                (schedule.interest.sum() - original.interest.sum()) / 100)